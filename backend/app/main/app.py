@@ -3,16 +3,24 @@
 ###############################################################
 
 from flask import Flask, Blueprint,jsonify, send_file
-from flask_socketio import SocketIO, send, emit
+from flask_socketio import SocketIO, send, emit, join_room, leave_room
 from flask import request
 from app.tools.log import Log
+from app.tools.encoding import encode_response
+from app.tools.push import NetworkPushChannel, PUSH_NAMESPACE, network_room
 from flask_cors import CORS
 import os
 import time
-import pandas as pd
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from tabulate import tabulate
 
 # custom imports
-from app.tools.causal_network.network_pyagrum import CausalNetwork
+from app.tools.causal_network.approximate_inference import DEFAULT_ENGINE, DEFAULT_EPSILON, DEFAULT_MAX_SAMPLES
+from app.tools.causal_network.registry import NetworkRegistry, UnknownNetworkError, AUTOSAVE_SNAPSHOT_ID, DEFAULT_MAX_BYTES
+from app.tools.causal_network.effect_matrix import EffectMatrixWorker, DEFAULT_MAX_WORKERS, MAX_POOL_RESTARTS
 from app.tools.chat.chat_assistant import Chat_assistant
 from app.tools.chat.format_prompt import build_prompt_str, INITIAL_PROMPT
 
@@ -22,6 +30,7 @@ from app.tools.chat.format_prompt import build_prompt_str, INITIAL_PROMPT
 cwd = os.getcwd()
 main = Blueprint('main', __name__)
 socketio = SocketIO(cors_allowed_origins="*")
+push_channel = NetworkPushChannel(socketio)
 
 log = Log()
 time_of_logger_instantiation= str(time.time()).split(".")[0]
@@ -39,13 +48,55 @@ def create_app():
 
 #################### CAUSAL NETWORK ###########################
 ###############################################################
-# uncomment lines below for student grades toy network
-# cn = CausalNetwork(data_path = f"{cwd}/toy_datasets/student_grades_toy.csv",
-#                    structure_path =f'{cwd}/toy_datasets/student_toy_graph.bif')
+# networks are registered in a json config and loaded on first access -- see networks.json to add datasets and networks
+networks_config_path_env_var_name = "NETWORKS_CONFIG_PATH"
+networks_config_path = os.getenv(networks_config_path_env_var_name, f"{cwd}/networks.json")
 
-# uncomment lines below for asia network
-cn = CausalNetwork(data_path = f"{cwd}/toy_datasets/sample_asia.csv",
-                   structure_path =f'{cwd}/toy_datasets/asia.bif')
+# network served by the /network/... routes (the /networks/<network_id>/... routes serve any registered network)
+default_network_id_env_var_name = "DEFAULT_NETWORK_ID"
+DEFAULT_NETWORK_ID = os.getenv(default_network_id_env_var_name, "asia")
+
+registry_max_bytes_env_var_name = "NETWORK_REGISTRY_MAX_BYTES"
+registry_max_bytes = int(os.getenv(registry_max_bytes_env_var_name, DEFAULT_MAX_BYTES))
+
+registry = NetworkRegistry(f"{cwd}/snapshots", max_bytes=registry_max_bytes)
+registry.load_config(networks_config_path)
+
+# processes precomputing the effect matrices of the loaded networks while the app is idle (0 disables the background worker)
+effect_matrix_workers_env_var_name = "EFFECT_MATRIX_WORKERS"
+effect_matrix_workers = int(os.getenv(effect_matrix_workers_env_var_name, DEFAULT_MAX_WORKERS))
+
+def push_effect_matrix_ready(network_id, matrix):
+    push_channel.emit('effect_matrix_ready', {"graphVersion": matrix.graph_version}, network_id)
+
+effect_matrix_worker = EffectMatrixWorker(lambda: dict(registry.networks), max_workers=effect_matrix_workers,
+                                          on_refresh=push_effect_matrix_ready) if effect_matrix_workers > 0 else None
+
+# processes evaluating the perturbations of sensitivity sweeps (1 evaluates them in the request's thread)
+# the effect matrix pool already uses every core but one, so sweeps default to the request's thread; raising this on top of it oversubscribes the cores
+sensitivity_workers_env_var_name = "SENSITIVITY_WORKERS"
+sensitivity_workers = int(os.getenv(sensitivity_workers_env_var_name, 1))
+sensitivity_executor = None
+sensitivity_pool_restarts = 0
+
+def get_sensitivity_executor():
+    """
+    Returns the process pool of sensitivity sweeps, created on first use (in the serving process), or None if sweeps run in the request's thread.
+    """
+    global sensitivity_executor
+    if sensitivity_executor is None and sensitivity_workers > 1 and sensitivity_pool_restarts <= MAX_POOL_RESTARTS:
+        sensitivity_executor = ProcessPoolExecutor(sensitivity_workers, mp_context=multiprocessing.get_context('spawn'))
+    return sensitivity_executor
+
+def drop_broken_sensitivity_executor():
+    """
+    Drops a broken sensitivity pool: the next sweep recreates it, up to MAX_POOL_RESTARTS times, after which sweeps run in the request's thread.
+    """
+    global sensitivity_executor, sensitivity_pool_restarts
+    if sensitivity_executor is not None:
+        sensitivity_executor.shutdown(wait=False, cancel_futures=True)
+        sensitivity_executor = None
+    sensitivity_pool_restarts += 1
 
 #################### CHAT ASSISTANT ###########################
 ###############################################################
@@ -59,6 +110,7 @@ except Exception as e:
     print(f"Exception: {e}")
     print(f"Unable to locate chatbot with id: {open_ai_assistant_id}. Instantiating new chatbot. Go to https://platform.openai.com/assistants to view assistant id and save to OPENAI_ASSISTANT_ID environment variables if not already populated.")
     # INITIAL_PROMPT["Initial adjacency matrix"] = cn.get_network_adjacency_matrix_str()
+    INITIAL_PROMPT["graph context"] = registry.description(DEFAULT_NETWORK_ID)
 
     setup_instructions = build_prompt_str(INITIAL_PROMPT)
     model = "gpt-4-turbo"
@@ -85,23 +137,46 @@ def home():
     res = {'data': 'Hello, causal chat user!'}
     return jsonify(res)
 
-@main.route('/network', methods=['GET','PUT'])
-def network():
+@main.errorhandler(UnknownNetworkError)
+def unknown_network(e):
+    """
+    Returns a 404 for routes addressing a network id that is not registered.
+    """
+    return jsonify({"error":f"Unknown network: {e.args[0]}"}), 404
+
+@main.route('/networks', methods=['GET'])
+def networks():
+    """
+    Fetch the registered networks.
+
+    Returns:
+        response (json): A JSON object containing the id, description and load state of each network, and the id of the default network.
+    """
+    res = {"networks":registry.list(), "default":DEFAULT_NETWORK_ID}
+    return jsonify(res), 200
+
+@main.route('/network', methods=['GET','PUT'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>', methods=['GET','PUT'])
+def network(network_id):
     """
     Fetch or update the network graph.
 
     Args:
         format (str): The format of the network graph to return.
+        relayout (bool, optional): lay the whole graph out again (node positions otherwise only move as needed after edits)
 
     Returns:
-        response (json): A JSON object containing network graph data. Default and sole current available is cytoscape element format.
+        response (json): A JSON object containing network graph data. Default and sole current available is cytoscape element format, with node positions.
     """
+    cn = registry.get(network_id)
     if request.method == 'PUT':
-            return update_network()
+            return update_network(cn, network_id)
     
     # default to cytoscape format if no query param provided
     response_format = request.args.get('format', 'cytoscape').lower()
     if response_format == 'cytoscape':
+            if request.args.get('relayout', 'False').lower() == 'true':
+                cn.set_network_cytoscape_elements(relayout=True)
             res = cn.get_network_cytoscape_elements()
             return jsonify(res), 200
     else:
@@ -109,7 +184,7 @@ def network():
         res = {"message":"Network format not supported"}
         return jsonify(res), 200
 
-def update_network():
+def update_network(cn, network_id):
     '''
     Updates the network graph.
 
@@ -117,7 +192,7 @@ def update_network():
         changes (str): changes (edge addition or deletion) to be made to graph structure
 
     Returns:
-        response (json): A message indicating success of network update
+        response (json): A message indicating success of network update, the changes that were applied (rejected and no-op changes are left out) and the graph version
 
     ex. request body:
         {
@@ -133,29 +208,96 @@ def update_network():
 
     changes = req_body['changes']
     print(f"Attempting to make the following changes to network:\n{changes}\n")
-    try:
-        cn.update_network(changes)
-        print(f"Successfully made changes to network")
-    except Exception as e:
-        print(f"Error when attempting to make changes to network: {e}")
-    
-    for change in changes:
+    applied = []
+    # the network stays locked until the edit is autosaved and pushed, so the pushed version and positions are the edit's
+    with cn.lock:
         try:
-            deletion = change['deletion']
-            msg = f"Deleted edge: {deletion['data']['source']} -> {deletion['data']['target']}"
-            log.log_item(msg)
-        except KeyError as ke:
-            addition = change['addition']
-            msg = f"Added edge: {addition['data']['source']} -> {addition['data']['target']}"
-            log.log_item(msg)
+            applied = cn.update_network(changes)
+            print(f"Successfully made changes to network")
         except Exception as e:
-            print(f"Error when logging change:{e}")
+            print(f"Error when attempting to make changes to network: {e}")
+        
+        for change in applied:
+            try:
+                deletion = change['deletion']
+                msg = f"Deleted edge: {deletion['data']['source']} -> {deletion['data']['target']}"
+                log.log_item(msg)
+            except KeyError as ke:
+                addition = change['addition']
+                msg = f"Added edge: {addition['data']['source']} -> {addition['data']['target']}"
+                log.log_item(msg)
+            except Exception as e:
+                print(f"Error when logging change:{e}")
 
-    res = {"message":"Network updated :)"}
+        try:
+            cn.save_snapshot(registry.snapshot_store(network_id), AUTOSAVE_SNAPSHOT_ID)
+        except Exception as e:
+            print(f"Error when autosaving network: {e}")
+        # only the applied changes are pushed, so clients never draw an edge the network rejected (ex. a cycle)
+        if applied:
+            push_channel.queue_graph_patch(network_id, cn.graph_version, applied,
+                                           positions={node: cn.layout.positions[node] for node in cn.layout.moved if node in cn.layout.positions})
+        graph_version = cn.graph_version
+
+    res = {"message":"Network updated :)", "applied":applied, "graphVersion":graph_version}
     return jsonify(res), 200
 
-@main.route('/network/data', methods=['GET'])
-def get_network_data():
+@main.route('/network/snapshots', methods=['GET','POST'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/snapshots', methods=['GET','POST'])
+def network_snapshots(network_id):
+    """
+    List the saved snapshots of the network, or save the current network as a new snapshot.
+
+    Args:
+        id (str, optional): request body key for POST -- id of the snapshot to save (a new time based id by default)
+
+    Returns:
+        response (json): A JSON object containing the list of snapshots (GET) or the saved snapshot (POST).
+    """
+    cn = registry.get(network_id)
+    snapshot_store = registry.snapshot_store(network_id)
+    if request.method == 'POST':
+        req_body = request.get_json(silent=True) or {}
+        try:
+            snapshot = cn.save_snapshot(snapshot_store, req_body.get('id', None))
+        except Exception as e:
+            print(f"Error when saving snapshot: {e}")
+            return jsonify({"error":f"unable to save snapshot; {str(e)}"}), 400
+        return jsonify({"snapshot":snapshot}), 200
+
+    return jsonify({"snapshots":snapshot_store.list()}), 200
+
+@main.route('/network/snapshots/<snapshot_id>', methods=['GET','PUT'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/snapshots/<snapshot_id>', methods=['GET','PUT'])
+def network_snapshot(snapshot_id, network_id):
+    """
+    Export a snapshot as a BIF file, or restore the network from a snapshot.
+
+    Args:
+        snapshot_id (str): id of the snapshot
+
+    Returns:
+        response: the BIF file (GET), or a JSON object containing the restored network in cytoscape element format (PUT).
+    """
+    cn = registry.get(network_id)
+    snapshot_store = registry.snapshot_store(network_id)
+    try:
+        if request.method == 'PUT':
+            with cn.lock:
+                cn.restore_snapshot(snapshot_store, snapshot_id)
+                cn.save_snapshot(snapshot_store, AUTOSAVE_SNAPSHOT_ID)
+                log.log_item(f"Restored network from snapshot {snapshot_id}")
+                push_channel.replace_graph(network_id, cn.graph_version, cn.get_network_cytoscape_elements())
+                return jsonify(cn.get_network_cytoscape_elements()), 200
+
+        bif_path = snapshot_store.export_bif(snapshot_id, f"{snapshot_store.directory}/{snapshot_id}.bif")
+        return send_file(bif_path, as_attachment=True)
+    except (ValueError, FileNotFoundError) as e:
+        return jsonify({"error":str(e)}), 404
+
+@main.route('/network/data', methods=['GET','POST'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/data', methods=['GET','POST'])
+def get_network_data(network_id):
     """
     Fetch the network graph.
 
@@ -165,22 +307,51 @@ def get_network_data():
     Returns:
         response (json): A JSON object containing network graph data. Default and sole current available is cytoscape element format.
     """
+    cn = registry.get(network_id)
+    if request.method == 'POST':
+        return append_network_data(cn)
+
     filter = request.args.get('filter', None)
     unique_values = request.args.get('unique_values', None)
     if filter:
         filter = filter.split(',')
-    df = cn.get_network_df(cols=filter)
     
     if unique_values:
-        # threshold = 3
-        # res = [{col:list(df[col].unique())} for col in df.columns[:threshold]]
-        res = [{col:list(df[col].unique())} for col in df.columns] #<-- this is the correct implementation
+        res = [{col:values} for col, values in cn.get_unique_values(cols=filter).items()]
         return jsonify(res), 200
     
+    df = cn.get_network_df(cols=filter)
     return jsonify(df.to_dict()), 200
 
-@main.route('/network/learn', methods=['PUT'])
-def learn_network():
+def append_network_data(cn):
+    '''
+    Appends rows to the network's data, updating the counts used for learning and independence tests without re-reading the csv.
+
+    Args:
+        rows (list[dict]): rows to append, each with a value for every variable
+
+    Returns:
+        response (json): A message with the number of rows in the data after appending
+
+    ex. request body:
+        {
+            "rows": [
+                        {"visit_to_Asia": "a2", "bronchitis": "g2", "positive_XraY": "d2", "smoking": "f1", "tuberculosis": "b2", "tuberculos_or_cancer": "c2", "dyspnoea": "h1", "lung_cancer": "e2"}
+                    ]
+        }
+    '''
+    req_body = request.get_json()
+    try:
+        n_rows = cn.append_data(req_body['rows'])
+    except Exception as e:
+        print(f"Error when attempting to append data: {e}")
+        return jsonify({"error":f'expects a body with a list of rows; {str(e)}'}), 400
+    res = {"message":f"Appended {len(req_body['rows'])} rows", "n_rows":n_rows}
+    return jsonify(res), 200
+
+@main.route('/network/learn', methods=['PUT'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/learn', methods=['PUT'])
+def learn_network(network_id):
     """
     Placeholder for algorithmically learning the network structure.
 
@@ -196,22 +367,32 @@ def learn_network():
         response (json): A placeholder JSON response.
     """
     req_body = request.get_json()
+    cn = registry.get(network_id)
     res = cn.get_network_cytoscape_elements()
     return jsonify(res), 200
 
-@main.route('/network/estimate_effect', methods=['GET'])
-def estimate_effect():
+@main.route('/network/estimate_effect', methods=['GET'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/estimate_effect', methods=['GET'])
+def estimate_effect(network_id):
     """
     Fetch a causal estimate.
 
     Args:
         treatment (str): the "do" variable and value -- expects treatment query param in format of <treatment~value> (ex. petrissage_lissage~aVI_I_FI)
         outcome (str): the outcome variable (ex. petrissage_collantDeLaPate)
+        method (str, optional): 'exact', 'approximate' or 'auto' (default) -- auto only approximates when the network is too large for exact inference
+        engine (str, optional): approximate engine -- 'importance' (default), 'loopy', 'gibbs', 'weighted' or 'montecarlo'
+        epsilon (float, optional): stopping criterion of the approximate engine
+        max_samples (int, optional): sample budget of the approximate engine
+        layout (str, optional): 'columnar' to return the estimate as {variables, labels, probabilities} arrays instead of nested dicts
+        X-Socket-Id (str, optional): header -- socket id of the client session to push the result to (every client subscribed to the network otherwise)
 
     Returns:
-        response (json): A JSON object containing a string for a pyAgrum.Potential object and an explanation of the estimate.
+        response (json): A JSON object containing a string for a pyAgrum.Potential object, an explanation of the estimate and its confidence intervals (null for exact estimates).
+        The result is also pushed as an 'estimate_result' event on the network push channel.
     
     """
+    cn = registry.get(network_id)
     try:
         if '~' in request.args.get('treatment'):
             treatment, treatment_val = request.args.get('treatment').split('~')
@@ -223,27 +404,153 @@ def estimate_effect():
             values = {treatment: treatment_val}
         else:
             values = None
-        estimate, explanation, formula = cn.get_causal_estimate(outcome, treatment, knowing=None, values=values)
-
-        # convert estimate to dataframe for better formatting
-        estimate_df = pd.DataFrame(estimate)
-
-        if estimate_df.isnull().values.any():
+        method = request.args.get('method', 'auto').lower()
+        engine = request.args.get('engine', DEFAULT_ENGINE).lower()
+        epsilon = float(request.args.get('epsilon', DEFAULT_EPSILON))
+        max_samples = int(request.args.get('max_samples', DEFAULT_MAX_SAMPLES))
+        layout = request.args.get('layout', 'nested').lower()
+        estimate, explanation, formula, confidence_interval = cn.get_causal_estimate_arrays(outcome, treatment, knowing=None, values=values,
+                                                                                           method=method, engine=engine,
+                                                                                           epsilon=epsilon, max_samples=max_samples)
+
+        if np.isnan(estimate['probabilities']).any():
             raise Exception("Found NaN in estimate")
         
-        log_message = f"Estimated causal effect on Y={outcome} when doing X=({treatment}={treatment_val}). Result:\n{estimate_df.to_markdown(tablefmt='grid')}\n\n{explanation}\nFormula:{formula}\n"
-        log.log_item(log_message)
-        print("Briggs: 123",estimate_df)
-        res = {"causal_estimate":estimate_df.to_dict(),"explanation":explanation, "formula":formula}
+        # markdown is only formatted when the log will keep it
+        if log.active:
+            log_message = f"Estimated causal effect on Y={outcome} when doing X=({treatment}={treatment_val}). Result:\n{estimate_markdown(estimate)}\n\n{explanation}\nFormula:{formula}\n"
+            log.log_item(log_message)
+        causal_estimate = estimate if layout == 'columnar' else nested_estimate(estimate)
+        res = {"causal_estimate":causal_estimate,"explanation":explanation, "formula":formula, "confidence_interval":confidence_interval}
+        try:
+            # pushed in the nested (json-safe) form whatever the response layout; a failed push does not fail the request
+            push_channel.emit('estimate_result', {"treatment":request.args.get('treatment'), "outcome":outcome, **res,
+                                                  "causal_estimate":nested_estimate(estimate)}, network_id,
+                              sid=request.headers.get('X-Socket-Id', None))
+        except Exception as e:
+            print(f"Error when pushing estimate result: {e}")
         
-        return jsonify(res), 200
+        return encode_response(res)
     except Exception as e:
         print("Error while estimating effect",e)
         res = {"error":f'expects query params in format of treatment~value, outcome~value; {str(e)}'}
         return jsonify(res), 200
 
-@main.route('/network/markov_blanket', methods=['GET'])
-def get_markov_blanket():
+def nested_estimate(estimate):
+    '''
+    Converts columnar estimate arrays to the nested dict format of the frontend -- {outcome: {outcome value: probability}}, with one more level per other variable.
+    '''
+    def nest(probabilities, labels):
+        if not labels:
+            return probabilities.item()
+        return {label: nest(probabilities[..., i], labels[:-1]) for i, label in enumerate(labels[-1])}
+    return {estimate['variables'][-1]: nest(estimate['probabilities'], estimate['labels'])}
+
+def estimate_markdown(estimate):
+    '''
+    Formats columnar estimate arrays as a grid table -- one row per outcome value, one column per combination of the other variables' values.
+    '''
+    probabilities = np.moveaxis(estimate['probabilities'], -1, 0).reshape(len(estimate['labels'][-1]), -1)
+    other_labels = [[]]
+    for labels in estimate['labels'][:-1]:
+        other_labels = [combination + [label] for label in labels for combination in other_labels]
+    headers = [",".join(combination) or estimate['variables'][-1] for combination in other_labels]
+    rows = [[label] + row for label, row in zip(estimate['labels'][-1], probabilities.tolist())]
+    return tabulate(rows, headers=headers, tablefmt='grid')
+
+@main.route('/network/posterior', methods=['GET'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/posterior', methods=['GET'])
+def get_posterior(network_id):
+    """
+    Fetch the observational distribution of a variable given evidence.
+
+    Args:
+        target (str): the variable whose distribution will be returned
+        evidence (str, optional): comma separated observations in format of <variable~value> (ex. smoking~f1,visit_to_Asia~a1)
+
+    Returns:
+        response (json): A JSON object containing the probability of each value of the target variable.
+    """
+    cn = registry.get(network_id)
+    try:
+        target = request.args.get('target')
+        evidence = request.args.get('evidence', None)
+        if evidence:
+            evidence = dict(observation.split('~') for observation in evidence.split(','))
+        posterior = cn.get_posterior(target, evidence)
+        res = {"posterior":{target:posterior}}
+        return jsonify(res), 200
+    except Exception as e:
+        print("Error while getting posterior",e)
+        res = {"error":f'expects query params for target and evidence in format of variable~value; {str(e)}'}
+        return jsonify(res), 200
+
+@main.route('/network/effect_matrix', methods=['GET'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/effect_matrix', methods=['GET'])
+def get_effect_matrix(network_id):
+    """
+    Fetch the average causal effect of every variable on every other variable, precomputed in the background while the app is idle.
+    The effect of a treatment on an outcome is the largest total variation distance between the outcome's distributions under two interventions on the treatment
+    (|P(y|do(x1)) - P(y|do(x0))| for binary variables).
+
+    Args:
+        compute_pending (bool, optional): compute the pairs still pending after an edit before responding (default: only when the background worker is disabled)
+
+    Returns:
+        response (json): A JSON object with the variables, the effects matrix (effects[i][j] is the effect of variables[i] on variables[j], null while pending),
+        the graph version and the number of pending pairs.
+    """
+    cn = registry.get(network_id)
+    try:
+        compute_pending = request.args.get('compute_pending', str(effect_matrix_worker is None)).lower() == 'true'
+        res = cn.get_effect_matrix(compute_pending=compute_pending)
+        return encode_response(res)
+    except Exception as e:
+        print("Error while getting effect matrix",e)
+        res = {"error":f'Error while getting effect matrix: {str(e)}'}
+        return jsonify(res), 200
+
+@main.route('/network/sensitivity', methods=['GET','POST'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/sensitivity', methods=['GET','POST'])
+def get_sensitivity(network_id):
+    """
+    Fetch a robustness report of the causal effect of a treatment on an outcome: the estimate under every single-edge addition, deletion and reversal
+    of a candidate set, ranked by how much each perturbation changes it.
+
+    Args:
+        treatment (str): the treatment variable (query param for GET, body key for POST)
+        outcome (str): the outcome variable (query param for GET, body key for POST)
+        candidates (list, optional): body key for POST -- perturbations to evaluate, ex. [{"type": "reversal", "source": "smoking", "target": "lung_cancer"}]
+            (default: every addition, deletion and reversal among the outcome's ancestors)
+
+    Returns:
+        response (json): A JSON object with the baseline estimate and effect, the largest change, the perturbations ranked by change
+        (largest total variation distance between the baseline and perturbed outcome distributions under any intervention) and the skipped candidates.
+    """
+    cn = registry.get(network_id)
+    try:
+        params = request.get_json() if request.method == 'POST' else request.args
+        treatment = params.get('treatment')
+        outcome = params.get('outcome')
+        candidates = params.get('candidates', None) if request.method == 'POST' else None
+        executor = get_sensitivity_executor()
+        try:
+            res = cn.get_sensitivity_report(treatment, outcome, candidates=candidates, executor=executor,
+                                            n_chunks=sensitivity_workers * 4 if executor is not None else 1)
+        except BrokenProcessPool as e:
+            print(f"Sensitivity process pool broke, evaluating in the request's thread: {e}")
+            drop_broken_sensitivity_executor()
+            res = cn.get_sensitivity_report(treatment, outcome, candidates=candidates)
+        log.log_item(f"Tested the sensitivity of the effect of {treatment} on {outcome} to {len(res['perturbations'])} edge changes; largest change: {res['max_change']:.3f}")
+        return encode_response(res)
+    except Exception as e:
+        print("Error while testing sensitivity",e)
+        res = {"error":f'expects treatment and outcome variables; {str(e)}'}
+        return jsonify(res), 200
+
+@main.route('/network/markov_blanket', methods=['GET'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/markov_blanket', methods=['GET'])
+def get_markov_blanket(network_id):
     """
     Fetch the Markov blanket for a target variable.
 
@@ -253,6 +560,7 @@ def get_markov_blanket():
     Returns:
         response (json): A JSON object containing the Markov blanket of the target variable.
     """
+    cn = registry.get(network_id)
     try:
         target = request.args.get('target')
         print("target = ",target)
@@ -269,35 +577,46 @@ def get_markov_blanket():
         res = {"error":f'expects query param for target; {str(e)}'}
         return jsonify(res), 200
 
-@main.route('/network/test_independence', methods=['GET'])
-def test_independence():
+@main.route('/network/test_independence', methods=['GET'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/test_independence', methods=['GET'])
+def test_independence(network_id):
     """
     Return the conditional independence test for all pairs of independent nodes in the graph.
 
+    Args:
+        target (str, optional): only test the independences given a subset of the markov blanket of this variable
+        layout (str, optional): 'columnar' to return {independence_assumption, conditioning_set, value} arrays instead of a list of tests
+
     Returns:
         response (json): A JSON object containing independence assumption, conditioning set, and the p-value for the set of independence assumptions in the causal model
     """
+    cn = registry.get(network_id)
     # currently unused in frontend -- i.e. always returns all independence assumptions
-    if request.args:
-        target = request.args.get('target')
-    else:
-        target = None
+    target = request.args.get('target', None)
+    layout = request.args.get('layout', 'rows').lower()
     
-    independence_test_dict = cn.get_independence_test_dict(target)
+    independence_tests = cn.get_independence_test_columns(target)
     
-    formatted_data = [
-        {"independence_assumption": [key[0], key[1]], 
-         "conditioning_set":list(key[2]),
-         "value": value}
-        for key, value in independence_test_dict.items()
-    ]
+    if layout == 'columnar':
+        formatted_data = independence_tests
+    else:
+        formatted_data = [
+            {"independence_assumption": assumption, 
+             "conditioning_set":conditioning_set,
+             "value": value}
+            for assumption, conditioning_set, value in zip(independence_tests['independence_assumption'],
+                                                            independence_tests['conditioning_set'],
+                                                            independence_tests['value'].tolist())
+        ]
 
     res = {"independence_test_dict":formatted_data}
-    return jsonify(res), 200
+    return encode_response(res)
 
 
-@main.route('/network/test_independence/log', methods=['PUT'])
-def log_independence():
+@main.route('/network/test_independence/log', methods=['PUT'], defaults={'network_id': DEFAULT_NETWORK_ID})
+@main.route('/networks/<network_id>/test_independence/log', methods=['PUT'])
+def log_independence(network_id):
+    registry.description(network_id)
     req_body = request.get_json()
     if req_body:
         independence_test = req_body['target']
@@ -349,6 +668,15 @@ def get_chat_history():
         print(msg)
         return jsonify({"error":msg})
 
+@main.before_app_request
+def record_activity():
+    """
+    Pauses the effect matrix worker while the user is active (the worker is started with the first request, in the serving process).
+    """
+    if effect_matrix_worker is not None:
+        effect_matrix_worker.touch()
+        effect_matrix_worker.start()
+
 @main.after_request
 def auto_submit_interations_to_chat(response):
     """
@@ -361,7 +689,8 @@ def auto_submit_interations_to_chat(response):
             or (request.method == 'PUT' and request.endpoint in ['main.log_independence','main.network']):
             if len(log.log) >= auto_submit_threshold:
                 print(f'Auto submitting interaction history because threshold of {auto_submit_threshold} interactions reached.')
-                handle_user_message({"message": "", "sendUserActions": True})
+                network_id = (request.view_args or {}).get('network_id', DEFAULT_NETWORK_ID)
+                handle_user_message({"message": "", "sendUserActions": True, "networkId": network_id})
     except Exception as e:
         print(f"Error in auto_submit_interations_to_chat: {e}")
     # You can also modify the response if needed
@@ -387,19 +716,24 @@ def handle_user_message(json):
     """
     Handles user messages and sends responses via socket connection.
     Expects json blob with message and sendUserActions key -- ex. {"message":"hello,"sendUserActions":true}
+    An optional networkId key gives the network the user is working with (the default network otherwise).
     """
     try:
         user_chat_message = json.get('message')
         send_user_actions = json.get('sendUserActions',False)
+        network_id = json.get('networkId', DEFAULT_NETWORK_ID)
         
+        additional_instructions_content = {}
+        if network_id != DEFAULT_NETWORK_ID:
+            # the assistant was set up with the default network's context
+            additional_instructions_content["graph context"] = registry.description(network_id)
         if send_user_actions and log.active and len(log.log) > 0:
             user_action_history_list = log.get_log_and_flush()
             user_action_history_str = ""
             for i,action in enumerate(user_action_history_list):
                 user_action_history_str += f"{i+1}){action}\n"
-            additional_instructions = build_prompt_str({"user action history:":user_action_history_str})
-        else:
-            additional_instructions = None
+            additional_instructions_content["user action history:"] = user_action_history_str
+        additional_instructions = build_prompt_str(additional_instructions_content) if additional_instructions_content else None
         
         if user_chat_message:
             user_chat_message = build_prompt_str({"User":user_chat_message})
@@ -425,4 +759,93 @@ def disconnect():
     """
     Disconnects socket connection from the client.
     """
-    print('Client disconnected')
\ No newline at end of file
+    print('Client disconnected')
+
+###############################################################
+################### NETWORK PUSH CHANNEL ######################
+###############################################################
+@socketio.on('subscribe', namespace=PUSH_NAMESPACE)
+def subscribe(json):
+    """
+    Subscribes the client to the updates of a network (graph patches, estimate results, learning job updates).
+    Expects json blob with an optional networkId key (the default network otherwise) -- ex. {"networkId":"asia"}
+    """
+    network_id = (json or {}).get('networkId', DEFAULT_NETWORK_ID)
+    try:
+        cn = registry.get(network_id)
+    except UnknownNetworkError:
+        emit('push_error', {"networkId": network_id, "error": f"Unknown network: {network_id}"})
+        return
+    join_room(network_room(network_id))
+    emit('subscribed', {"networkId": network_id, "graphVersion": cn.graph_version})
+
+@socketio.on('unsubscribe', namespace=PUSH_NAMESPACE)
+def unsubscribe(json):
+    """
+    Unsubscribes the client from the updates of a network.
+    """
+    network_id = (json or {}).get('networkId', DEFAULT_NETWORK_ID)
+    leave_room(network_room(network_id))
+
+@socketio.on('test_independence', namespace=PUSH_NAMESPACE)
+def push_independence_tests(json):
+    """
+    Runs the conditional independence tests of a network in the background, pushing 'independence_progress' events with the results as they finish
+    and an 'independence_result' event with every result (same format as /network/test_independence) to the requesting client.
+    Expects json blob with optional networkId and target keys -- ex. {"networkId":"asia","target":"smoking"}
+    """
+    json = json or {}
+    network_id = json.get('networkId', DEFAULT_NETWORK_ID)
+    target = json.get('target', None)
+    sid = request.sid
+    batch_size = 10
+
+    def run():
+        try:
+            cn = registry.get(network_id)
+            propositions = cn.get_independence_propositions(target)
+            results = []
+            batch = []
+            for (x, y, knowing), p_value in cn.iter_independence_tests(propositions):
+                test = {"independence_assumption": [x, y], "conditioning_set": list(knowing), "value": p_value}
+                results.append(test)
+                batch.append(test)
+                if len(batch) == batch_size:
+                    push_channel.emit('independence_progress', {"done": len(results), "total": len(propositions), "results": batch}, network_id, sid=sid)
+                    batch = []
+                    socketio.sleep(0)
+            if batch:
+                push_channel.emit('independence_progress', {"done": len(results), "total": len(propositions), "results": batch}, network_id, sid=sid)
+            push_channel.emit('independence_result', {"independence_test_dict": results}, network_id, sid=sid)
+        except Exception as e:
+            print(f"Error while testing independence: {e}")
+            push_channel.emit('push_error', {"error": f"Error while testing independence: {e}"}, network_id, sid=sid)
+
+    socketio.start_background_task(run)
+
+@socketio.on('learn_network', namespace=PUSH_NAMESPACE)
+def push_learn_network(json):
+    """
+    Learns the structure of a network from its data in the background, pushing 'learn_progress' events (started, finished or failed)
+    and the learned graph as a 'graph_patch' event to every client subscribed to the network.
+    Expects json blob with an optional networkId key -- ex. {"networkId":"asia"}
+    """
+    network_id = (json or {}).get('networkId', DEFAULT_NETWORK_ID)
+
+    def run():
+        push_channel.emit('learn_progress', {"status": "started"}, network_id)
+        try:
+            cn = registry.get(network_id)
+            # learning runs unlocked and only takes the lock to swap the learned network in; holding it here keeps the autosave and push on that version
+            cn.learn_causal_network()
+            with cn.lock:
+                cn.set_network_cytoscape_elements()
+                cn.save_snapshot(registry.snapshot_store(network_id), AUTOSAVE_SNAPSHOT_ID)
+                log.log_item(f"Learned the network structure with {cn.learning_algorthm}")
+                push_channel.replace_graph(network_id, cn.graph_version, cn.get_network_cytoscape_elements())
+                push_channel.emit('learn_progress', {"status": "finished", "graphVersion": cn.graph_version}, network_id)
+        except Exception as e:
+            print(f"Error while learning network: {e}")
+            push_channel.emit('learn_progress', {"status": "failed", "error": str(e)}, network_id)
+
+    socketio.start_background_task(run)
\ No newline at end of file
@@ -0,0 +1,146 @@
+import pyAgrum as gum
+
+import math
+from typing import Dict
+
+# approximate inference engines available to CausalNetwork.get_causal_estimate
+APPROXIMATE_ENGINES = {
+    'loopy': gum.LoopyBeliefPropagation,
+    'gibbs': gum.GibbsSampling,
+    'importance': gum.ImportanceSampling,
+    'weighted': gum.WeightedSampling,
+    'montecarlo': gum.MonteCarloSampling,
+}
+SAMPLING_ENGINES = {'gibbs', 'importance', 'weighted', 'montecarlo'}
+# engines drawing independent samples, whose estimates get a Wald interval (gibbs samples are correlated, so the interval would be far too narrow)
+INDEPENDENT_SAMPLING_ENGINES = SAMPLING_ENGINES - {'gibbs'}
+
+DEFAULT_ENGINE = 'importance'
+DEFAULT_EPSILON = 1e-2
+DEFAULT_MAX_SAMPLES = 100000
+
+# largest clique (in number of joint states) an exact estimate is allowed to build before falling back to approximate inference
+EXACT_INFERENCE_MAX_CLIQUE_SIZE = 10**7
+
+# z value for a 95% confidence interval
+CONFIDENCE_Z = 1.96
+
+def max_clique_size(bn:gum.BayesNet)->int:
+    """
+    Returns the number of joint states in the largest clique of the junction tree of a network (i.e. the memory an exact inference would need for its biggest table).
+    """
+    junction_tree = gum.JunctionTreeGenerator().junctionTree(bn)
+    largest = 1
+    for clique_id in junction_tree.nodes():
+        size = 1
+        for node in junction_tree.clique(clique_id):
+            size *= bn.variable(node).domainSize()
+        largest = max(largest, size)
+    return largest
+
+def cpt_bytes(bn:gum.BayesNet)->int:
+    """
+    Returns the memory held by the CPTs of a network (one float64 per entry).
+    """
+    return sum(bn.cpt(node).domainSize() * 8 for node in bn.nodes())
+
+def junction_tree_bytes(bn:gum.BayesNet)->int:
+    """
+    Returns the memory of the clique and separator tables of the junction tree of a network (one float64 per joint state),
+    i.e. a bound on what a compiled exact inference engine holds for it.
+    """
+    junction_tree = gum.JunctionTreeGenerator().junctionTree(bn)
+    size = 0
+    for nodes in [junction_tree.clique(clique_id) for clique_id in junction_tree.nodes()] + \
+                 [junction_tree.separator(*edge) for edge in junction_tree.edges()]:
+        size += math.prod(bn.variable(node).domainSize() for node in nodes) * 8
+    return size
+
+def mutilate(bn:gum.BayesNet, doing:str)->gum.BayesNet:
+    """
+    Returns a copy of the network where every arc into the treatment variable is removed (the graph of the do(doing) intervention).
+    """
+    mutilated = gum.BayesNet(bn)
+    target = mutilated.idFromName(doing)
+    for parent in list(mutilated.parents(target)):
+        mutilated.eraseArc(parent, target)
+    return mutilated
+
+def _wald_interval(p:float, n:int)->list[float]:
+    """
+    Helper returning a rounded 95% normal-approximation interval for a sampled probability.
+    """
+    half_width = CONFIDENCE_Z * math.sqrt(p * (1 - p) / n)
+    return [round(max(0.0, p - half_width), 3), round(min(1.0, p + half_width), 3)]
+
+def approximate_causal_impact(bn:gum.BayesNet, on:str, doing:str, knowing=None, values:Dict[str, str]=None,
+                              engine:str=DEFAULT_ENGINE, epsilon:float=DEFAULT_EPSILON,
+                              max_samples:int=DEFAULT_MAX_SAMPLES, max_time:float=None, mutilated:gum.BayesNet=None)->tuple[gum.Potential, str, str, dict]:
+    """
+    Approximates P(on | do(doing), knowing) by running an approximate inference engine on the mutilated graph.
+
+    :param bn: the causal network
+    :param on: outcome variable
+    :param doing: treatment variable
+    :param knowing: conditioning variables (each needs an entry in values)
+    :param values: values for the doing and knowing variables
+    :param engine: one of APPROXIMATE_ENGINES
+    :param epsilon: stopping criterion of the engine
+    :param max_samples: maximum number of iterations (samples for the sampling engines)
+    :param max_time: maximum number of seconds per inference, if any
+    :param mutilated: the graph of the intervention if it was already built (ex. copied while the network was locked)
+
+    return: tuple[gum.Potential, str, str, dict] - estimate, explanation, latex formula and 95% intervals per outcome value (None for loopy belief propagation and gibbs sampling)
+    """
+    if engine not in APPROXIMATE_ENGINES:
+        raise ValueError(f"Unknown approximate engine '{engine}'; expected one of {sorted(APPROXIMATE_ENGINES)}")
+    values = values or {}
+    knowing = set(knowing or [])
+    missing = [k for k in knowing if k not in values]
+    if missing:
+        raise ValueError(f"Approximate estimates need a value for every conditioning variable; missing {missing}")
+
+    mutilated = mutilate(bn, doing) if mutilated is None else mutilated
+    # the returned potential refers to the variables of bn, which outlive the mutilated copy; it keeps bn alive like pyAgrum's engines do (_model)
+    outcome_var = bn.variable(on)
+    treatment_var = bn.variable(doing)
+    treatment_labels = [values[doing]] if doing in values else list(treatment_var.labels())
+
+    posteriors = []
+    intervals = {}
+    iterations = []
+    message = ''
+    for treatment_label in treatment_labels:
+        ie = APPROXIMATE_ENGINES[engine](mutilated)
+        ie.setEpsilon(epsilon)
+        ie.setMaxIter(max_samples)
+        if max_time:
+            ie.setMaxTime(max_time)
+        ie.addEvidence(doing, treatment_label)
+        for k in knowing:
+            ie.addEvidence(k, values[k])
+        ie.makeInference()
+
+        posterior = ie.posterior(on).toarray().tolist()
+        posteriors.extend(posterior)
+        iterations.append(ie.nbrIterations())
+        message = ie.messageApproximationScheme()
+        if engine in INDEPENDENT_SAMPLING_ENGINES:
+            for label, p in zip(outcome_var.labels(), posterior):
+                interval = _wald_interval(p, ie.nbrIterations())
+                if doing in values:
+                    intervals[label] = interval
+                else:
+                    intervals.setdefault(label, {})[treatment_label] = interval
+
+    effect = gum.Potential()
+    effect.add(outcome_var)
+    if doing not in values:
+        effect.add(treatment_var)
+    effect.fillWith(posteriors)
+    effect._model = bn
+
+    conditioning = ','.join([doing] + sorted(knowing))
+    formula = f"P( {on} \\mid \\text{{do}}({doing})) \\approx P_{{\\overline{{{doing}}}}}\\left({on}\\mid {conditioning}\\right)"
+    explanation = f"approximate estimate by {engine} on the graph with arcs into {doing} removed ({sum(iterations)} iterations, {message})."
+    return effect, explanation, formula, ({on: intervals} if engine in INDEPENDENT_SAMPLING_ENGINES else None)
@@ -0,0 +1,157 @@
+import pyAgrum as gum
+import pandas as pd
+import numpy as np
+
+import os
+from typing import Dict, List
+
+# rows read per chunk when streaming a csv
+DEFAULT_CHUNKSIZE = 100000
+
+class ChunkedDataset:
+    """
+    Sufficient statistics of a categorical csv dataset, built by streaming the file in chunks.
+
+    Each distinct row is kept once as integer codes together with the number of times it occurs, so memory grows with the number of distinct rows rather than
+    with the size of the file. Categories are inferred and encoded on the fly as chunks arrive; new rows can be appended without re-reading the file.
+
+    attributes:
+    - data_path (str): path to the csv file.
+    - chunksize (int): number of rows read per chunk.
+    - columns (list): column names, in file order.
+    - categories (dict): column name -> list of labels, in order of first appearance (the label of code i is categories[col][i]).
+    - patterns (numpy.ndarray): integer codes of each distinct row, shape (n_patterns, n_columns).
+    - weights (numpy.ndarray): number of occurrences of each distinct row.
+
+    Methods:
+    - ingest
+    - add
+    - append
+    - n_rows
+    - codes
+    - unique_values
+    - to_frame
+    - learner
+    """
+    def __init__(self, data_path:str, chunksize:int=DEFAULT_CHUNKSIZE)->None:
+        """
+        Constructor for a new (empty) chunked dataset; call ingest() to stream the file.
+        """
+        self.data_path = data_path
+        self.chunksize = chunksize
+        self.columns = []
+        self.categories = {}
+        self.patterns = np.zeros((0, 0), dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.int64)
+
+    def _read_csv(self, **kwargs):
+        """
+        Helper reading the csv with every value kept as a label.
+        """
+        return pd.read_csv(self.data_path, dtype=str, keep_default_na=False, **kwargs)
+
+    def ingest(self)->None:
+        """
+        Streams the csv file chunk by chunk and rebuilds the distinct row counts.
+        """
+        self.columns = []
+        self.categories = {}
+        self.patterns = np.zeros((0, 0), dtype=np.int32)
+        self.weights = np.zeros(0, dtype=np.int64)
+        for chunk in self._read_csv(chunksize=self.chunksize):
+            self.add(chunk)
+
+    def _encode(self, df:pd.DataFrame)->np.ndarray:
+        """
+        Helper encoding a chunk to integer codes, registering labels not seen before.
+        """
+        if not self.columns:
+            self.columns = list(df.columns)
+            self.categories = {col: [] for col in self.columns}
+            self.patterns = np.zeros((0, len(self.columns)), dtype=np.int32)
+
+        codes = np.empty((len(df), len(self.columns)), dtype=np.int32)
+        for i, col in enumerate(self.columns):
+            values = df[col].astype(str).to_numpy()
+            labels = pd.Index(self.categories[col])
+            col_codes = labels.get_indexer(values)
+            if (col_codes < 0).any():
+                new_labels = pd.unique(values[col_codes < 0])
+                self.categories[col].extend(new_labels.tolist())
+                col_codes = pd.Index(self.categories[col]).get_indexer(values)
+            codes[:, i] = col_codes
+        return codes
+
+    def add(self, df:pd.DataFrame)->None:
+        """
+        Adds the rows of a dataframe (with the dataset's columns) to the distinct row counts.
+        """
+        if len(df) == 0:
+            return
+        codes = self._encode(df)
+        patterns = np.concatenate([self.patterns, codes])
+        weights = np.concatenate([self.weights, np.ones(len(codes), dtype=np.int64)])
+        self.patterns, inverse = np.unique(patterns, axis=0, return_inverse=True)
+        self.weights = np.bincount(inverse.ravel(), weights=weights, minlength=len(self.patterns)).astype(np.int64)
+
+    def append(self, rows:List[Dict[str, str]])->pd.DataFrame:
+        """
+        Appends new rows to the csv file and updates the counts without re-reading the file.
+
+        :param rows: list of dicts of column name -> value; every column of the dataset is required
+
+        return: pd.DataFrame - the appended rows
+        """
+        df = pd.DataFrame(rows, dtype=str)
+        missing = [col for col in self.columns if col not in df.columns]
+        if missing:
+            raise ValueError(f"Appended rows are missing columns {missing}")
+        df = df[self.columns]
+        self.add(df)
+
+        exists = os.path.exists(self.data_path)
+        if exists and os.path.getsize(self.data_path) > 0:
+            with open(self.data_path, 'rb') as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b'\n':
+                    with open(self.data_path, 'a') as out:
+                        out.write('\n')
+        df.to_csv(self.data_path, mode='a', header=not exists, index=False)
+        return df
+
+    def n_rows(self)->int:
+        """
+        Returns the number of rows seen so far.
+        """
+        return int(self.weights.sum())
+
+    def codes(self, col:str)->np.ndarray:
+        """
+        Returns the integer codes of a column for every distinct row.
+        """
+        return self.patterns[:, self.columns.index(col)]
+
+    def unique_values(self, cols:List[str]=None)->Dict[str, list]:
+        """
+        Returns the labels of each requested column (all columns by default).
+        """
+        return {col: list(self.categories[col]) for col in (cols or self.columns)}
+
+    def to_frame(self)->pd.DataFrame:
+        """
+        Returns the distinct rows as labels, one row per distinct row (counts in weights).
+        """
+        return pd.DataFrame({col: np.asarray(self.categories[col], dtype=object)[self.patterns[:, i]]
+                             for i, col in enumerate(self.columns)}, columns=self.columns)
+
+    def learner(self, bn:gum.BayesNet=None)->gum.BNLearner:
+        """
+        Returns a pyAgrum.BNLearner over the distinct rows weighted by their counts (equivalent to a learner over the whole file).
+
+        :param bn: optional network giving the variables' domains (as in gum.BNLearner(data, bn))
+        """
+        df = self.to_frame()
+        learner = gum.BNLearner(df, bn) if bn is not None else gum.BNLearner(df)
+        for i, weight in enumerate(self.weights.tolist()):
+            learner.setRecordWeight(i, float(weight))
+        return learner
@@ -0,0 +1,165 @@
+import numpy as np
+
+import math
+import threading
+from collections import OrderedDict
+from typing import List
+
+from app.tools.causal_network.chunked_data import ChunkedDataset
+
+# memory budget of the cached contingency tables
+DEFAULT_MAX_BYTES = 256 * 1024**2
+
+def chi2_sf(statistic:float, dof:int)->float:
+    """
+    Returns the survival function (p-value) of the chi-squared distribution for an integer number of degrees of freedom (closed form, no scipy needed).
+    """
+    if dof <= 0:
+        return 1.0
+    if statistic <= 0:
+        return 1.0
+    half = statistic / 2
+    if dof % 2 == 0:
+        term = total = 1.0
+        for i in range(1, dof // 2):
+            term *= half / i
+            total += term
+        return min(1.0, math.exp(-half) * total)
+    total = math.erfc(math.sqrt(half))
+    if dof > 1:
+        term = math.sqrt(statistic / math.pi) * math.exp(-half) * math.sqrt(2)
+        series = term
+        for i in range(1, (dof - 1) // 2):
+            term *= statistic / (2 * i + 1)
+            series += term
+        total += series
+    return min(1.0, total)
+
+def chi2_independence(table:np.ndarray)->tuple[float, float]:
+    """
+    Pearson chi-squared test that the first two axes of a contingency table are independent given the remaining axes.
+
+    return: tuple[float, float] - statistic and p-value
+    """
+    x_y = table.reshape(table.shape[0], table.shape[1], -1).astype(float)
+    z = x_y.sum(axis=(0, 1))
+    x_z = x_y.sum(axis=1)
+    y_z = x_y.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = x_z[:, None, :] * y_z[None, :, :] / z[None, None, :]
+        cells = np.where(expected > 0, (x_y - expected) ** 2 / expected, 0.0)
+    statistic = float(cells.sum())
+    dof = (table.shape[0] - 1) * (table.shape[1] - 1) * x_y.shape[2]
+    return statistic, chi2_sf(statistic, dof)
+
+class CountTableCache:
+    """
+    Memory-bounded LRU cache of contingency tables over a ChunkedDataset, shared by CPT fitting and independence tests.
+
+    Tables are keyed by the sorted tuple of their variables and computed with numpy.bincount over the integer-encoded distinct rows (weighted by their counts).
+    A table that is missing is marginalized from the smallest cached table over a superset of its variables when there is one. Axes follow the dataset's codes
+    (ChunkedDataset.categories). The cache empties itself when the dataset gains rows or labels. Tables are requested from several threads
+    (edits, sensitivity sweeps, independence tests), so the cache is locked while it is read or updated.
+
+    attributes:
+    - dataset (ChunkedDataset): the data the tables are counted from.
+    - max_bytes (int): memory budget of the cached tables.
+    - tables (OrderedDict): sorted variable tuple -> table, least recently used first.
+    - hits, marginalizations, misses (int): how each request was answered.
+
+    Methods:
+    - counts
+    - clear
+    - nbytes
+    """
+    def __init__(self, dataset:ChunkedDataset, max_bytes:int=DEFAULT_MAX_BYTES)->None:
+        """
+        Constructor for a new count table cache over a dataset.
+        """
+        self.dataset = dataset
+        self.max_bytes = max_bytes
+        self.tables = OrderedDict()
+        self.hits = 0
+        self.marginalizations = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._stamp = self._dataset_stamp()
+
+    def _dataset_stamp(self)->tuple:
+        """
+        Helper identifying the dataset's current content (rows and labels).
+        """
+        return (self.dataset.n_rows(), tuple(len(labels) for labels in self.dataset.categories.values()))
+
+    def nbytes(self)->int:
+        """
+        Returns the memory used by the cached tables.
+        """
+        with self._lock:
+            return sum(table.nbytes for table in self.tables.values())
+
+    def clear(self)->None:
+        """
+        Drops every cached table.
+        """
+        with self._lock:
+            self.tables = OrderedDict()
+            self._stamp = self._dataset_stamp()
+
+    def _count(self, key:tuple)->np.ndarray:
+        """
+        Helper counting a table from the distinct rows of the dataset.
+        """
+        shape = tuple(len(self.dataset.categories[var]) for var in key)
+        if not key:
+            return np.array(self.dataset.n_rows(), dtype=np.int64)
+        codes = [self.dataset.codes(var) for var in key]
+        flat = np.ravel_multi_index(codes, shape)
+        counts = np.bincount(flat, weights=self.dataset.weights, minlength=math.prod(shape))
+        return counts.astype(np.int64).reshape(shape)
+
+    def _marginalize(self, key:tuple)->np.ndarray:
+        """
+        Helper summing the smallest cached superset table down to key, or None if no cached table covers key.
+        """
+        wanted = set(key)
+        supersets = [k for k in self.tables if wanted < set(k)]
+        if not supersets:
+            return None
+        superset = min(supersets, key=lambda k: self.tables[k].size)
+        self.tables.move_to_end(superset)
+        axes = tuple(i for i, var in enumerate(superset) if var not in wanted)
+        return self.tables[superset].sum(axis=axes)
+
+    def _store(self, key:tuple, table:np.ndarray)->None:
+        """
+        Helper caching a table and evicting least recently used tables beyond the memory budget (the new table is always kept).
+        """
+        self.tables[key] = table
+        while len(self.tables) > 1 and self.nbytes() > self.max_bytes:
+            self.tables.popitem(last=False)
+
+    def counts(self, variables:List[str])->np.ndarray:
+        """
+        Returns the contingency table of a set of variables, with one axis per variable in the given order.
+        """
+        with self._lock:
+            if self._dataset_stamp() != self._stamp:
+                self.clear()
+
+            key = tuple(sorted(variables))
+            if len(set(key)) != len(key):
+                raise ValueError(f"Count table variables must be distinct; got {list(variables)}")
+            if key in self.tables:
+                self.hits += 1
+                self.tables.move_to_end(key)
+                table = self.tables[key]
+            else:
+                table = self._marginalize(key)
+                if table is None:
+                    self.misses += 1
+                    table = self._count(key)
+                else:
+                    self.marginalizations += 1
+                self._store(key, table)
+        return np.transpose(table, [key.index(var) for var in variables])
@@ -0,0 +1,329 @@
+import pyAgrum as gum
+import numpy as np
+
+import os
+import time
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List
+
+from app.tools.causal_network.approximate_inference import mutilate, cpt_bytes
+
+# the worker only computes once no request was received for this many seconds
+DEFAULT_IDLE_SECONDS = 2.0
+
+# how often the worker checks for pending pairs
+DEFAULT_POLL_SECONDS = 1.0
+
+# processes computing effects in parallel (one core is left to the app)
+DEFAULT_MAX_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+
+# times a broken process pool is recreated before the worker falls back to computing in its thread
+MAX_POOL_RESTARTS = 1
+
+def average_causal_effect(distributions:np.ndarray)->float:
+    """
+    Returns the average causal effect of a treatment on an outcome from the outcome's distribution under each treatment value (one row per value):
+    the largest total variation distance between two interventions, which is |P(y|do(x1)) - P(y|do(x0))| for binary variables.
+    """
+    if len(distributions) < 2:
+        return 0.0
+    differences = np.abs(distributions[:, None, :] - distributions[None, :, :]).sum(axis=2) / 2
+    return float(differences.max())
+
+def interventional_distributions(bn:gum.BayesNet, treatment:str, outcomes:List[str])->Dict[str, np.ndarray]:
+    """
+    Computes P(outcome | do(treatment)) for several outcomes with one compiled engine of the mutilated network.
+
+    return: dict - outcome -> array with one distribution of the outcome per treatment value (rows)
+    """
+    ie = gum.LazyPropagation(mutilate(bn, treatment))
+    ie.setTargets(set(outcomes))
+    distributions = {outcome: [] for outcome in outcomes}
+    for value in range(bn.variable(treatment).domainSize()):
+        ie.setEvidence({treatment: value})
+        ie.makeInference()
+        for outcome in outcomes:
+            distributions[outcome].append(ie.posterior(outcome).toarray())
+    return {outcome: np.array(rows) for outcome, rows in distributions.items()}
+
+def effect_rows(bn:gum.BayesNet, tasks:List[tuple[str, List[str]]])->Dict[tuple[str, str], float]:
+    """
+    Computes average causal effects with one compiled engine per treatment.
+    Runs in worker processes, so it only uses its arguments.
+    :param bn: the network
+    :param tasks: list of (treatment, outcomes) -- outcomes must be descendants of the treatment
+
+    return: dict - (treatment, outcome) -> average causal effect
+    """
+    effects = {}
+    for treatment, outcomes in tasks:
+        for outcome, distributions in interventional_distributions(bn, treatment, outcomes).items():
+            effects[(treatment, outcome)] = average_causal_effect(distributions)
+    return effects
+
+class EffectMatrix:
+    """
+    All-pairs average causal effect matrix of a network, refreshed incrementally.
+
+    The effect of X on Y only depends on the CPTs of Y and its ancestors, so after an edit only the outcomes downstream of an edited child
+    (whose CPT was re-estimated) are recomputed. Pairs where X is not an ancestor of Y have no effect and are set without inference.
+    The matrix keeps its own copy of the network version it tracks, so it can be computed in the background while the network is edited.
+
+    attributes:
+    - bn (gum.BayesNet): copy of the tracked network version.
+    - graph_version (int): the tracked graph version.
+    - variables (list): variable names, in the order of the matrix's rows (treatments) and columns (outcomes).
+    - effects (np.ndarray): effects[i, j] is the average causal effect of variables[i] on variables[j] (NaN while pending).
+    - pending (np.ndarray): boolean mask of the pairs still to compute.
+
+    Methods:
+    - invalidate
+    - pending_tasks
+    - store
+    - n_pending
+    - refresh
+    - to_dict
+    - nbytes
+    """
+    def __init__(self, bn:gum.BayesNet, graph_version:int=0)->None:
+        """
+        Constructor for a new effect matrix with every pair pending.
+        """
+        self._lock = threading.Lock()
+        self.invalidate(bn, graph_version)
+
+    def invalidate(self, bn:gum.BayesNet, graph_version:int, arcs:list[tuple[str, str]]=None)->None:
+        """
+        Tracks a new version of the network.
+        :param bn: the network
+        :param graph_version: its graph version
+        :param arcs: the (source, target) arcs that were added or removed; if None the whole network was replaced and every pair is recomputed
+        """
+        with self._lock:
+            previous = getattr(self, 'variables', None)
+            self.bn = gum.BayesNet(bn)
+            self.graph_version = graph_version
+            if arcs is None or previous != list(self.bn.names()):
+                self.variables = list(self.bn.names())
+                self.effects = np.full((len(self.variables), len(self.variables)), np.nan)
+                self.pending = np.ones(self.effects.shape, dtype=bool)
+            else:
+                index = {name: i for i, name in enumerate(self.variables)}
+                outcomes = set()
+                for target in {target for _, target in arcs}:
+                    outcomes.add(target)
+                    outcomes.update(self.bn.variable(node).name() for node in self.bn.descendants(target))
+                columns = [index[outcome] for outcome in outcomes]
+                self.effects[:, columns] = np.nan
+                self.pending[:, columns] = True
+            np.fill_diagonal(self.effects, 0.0)
+            np.fill_diagonal(self.pending, False)
+
+    def pending_tasks(self)->tuple[gum.BayesNet, int, List[tuple[str, List[str]]]]:
+        """
+        Returns the pending work: pairs without effect are stored right away and the rest is grouped by treatment.
+
+        return: tuple - the tracked network, its graph version and the list of (treatment, outcomes) to compute with effect_rows
+        """
+        with self._lock:
+            tasks = []
+            for i, treatment in enumerate(self.variables):
+                columns = np.flatnonzero(self.pending[i])
+                if not len(columns):
+                    continue
+                descendants = {self.bn.variable(node).name() for node in self.bn.descendants(treatment)}
+                outcomes = []
+                for j in columns:
+                    if self.variables[j] in descendants:
+                        outcomes.append(self.variables[j])
+                    else:
+                        self.effects[i, j] = 0.0
+                        self.pending[i, j] = False
+                if outcomes:
+                    tasks.append((treatment, outcomes))
+            return self.bn, self.graph_version, tasks
+
+    def store(self, graph_version:int, effects:Dict[tuple[str, str], float])->bool:
+        """
+        Stores computed effects, unless the network changed since they were computed.
+
+        return: bool - whether the effects were stored
+        """
+        with self._lock:
+            if graph_version != self.graph_version:
+                return False
+            index = {name: i for i, name in enumerate(self.variables)}
+            for (treatment, outcome), effect in effects.items():
+                self.effects[index[treatment], index[outcome]] = effect
+                self.pending[index[treatment], index[outcome]] = False
+            return True
+
+    def n_pending(self)->int:
+        """
+        Returns the number of pairs still to compute.
+        """
+        return int(self.pending.sum())
+
+    def refresh(self)->None:
+        """
+        Computes every pending pair in the calling thread.
+        """
+        bn, graph_version, tasks = self.pending_tasks()
+        if tasks:
+            self.store(graph_version, effect_rows(bn, tasks))
+
+    def to_dict(self)->dict:
+        """
+        Returns the matrix as a json-serializable dict (pending pairs are None).
+        """
+        with self._lock:
+            effects = np.where(self.pending, None, self.effects).tolist()
+            return {"variables": self.variables, "effects": effects, "graphVersion": self.graph_version, "pending": int(self.pending.sum())}
+
+    def nbytes(self)->int:
+        """
+        Returns the memory held by the matrix and its copy of the network.
+        """
+        with self._lock:
+            return cpt_bytes(self.bn) + self.effects.nbytes + self.pending.nbytes
+
+class EffectMatrixWorker:
+    """
+    Background worker refreshing the effect matrices of the loaded networks while the app is idle.
+
+    Pending treatments are split into chunks computed by a process pool (on a copy of the network each), so the matrices are ready before they are asked for
+    and effect matrix requests are answered from memory. The worker yields as soon as a request comes in: chunks that have not started are cancelled
+    and stay pending until the app is idle again. If the pool breaks (ex. a process died), it is recreated once, then the worker computes in its own thread.
+
+    attributes:
+    - networks (Callable): returns the loaded networks as a dict of network id -> CausalNetwork.
+    - max_workers (int): number of processes (1 computes in the worker thread).
+    - idle_seconds (float): time without requests after which the worker starts computing.
+    - on_refresh (Callable): called with (network_id, effect matrix) when a matrix is complete.
+
+    Methods:
+    - start
+    - stop
+    - touch
+    - is_idle
+    """
+    def __init__(self, networks:Callable[[], dict], max_workers:int=DEFAULT_MAX_WORKERS, idle_seconds:float=DEFAULT_IDLE_SECONDS,
+                 on_refresh:Callable=None)->None:
+        """
+        Constructor for a new (stopped) effect matrix worker.
+        """
+        self.networks = networks
+        self.max_workers = max_workers
+        self.idle_seconds = idle_seconds
+        self.on_refresh = on_refresh
+        self._last_activity = time.monotonic()
+        self._stop = threading.Event()
+        self._thread = None
+        self._executor = None
+        self._pool_restarts = 0
+
+    def touch(self)->None:
+        """
+        Records user activity, pausing the worker for idle_seconds.
+        """
+        self._last_activity = time.monotonic()
+
+    def is_idle(self)->bool:
+        """
+        Returns whether no activity was recorded for idle_seconds.
+        """
+        return time.monotonic() - self._last_activity >= self.idle_seconds
+
+    def start(self)->None:
+        """
+        Starts the worker thread.
+        """
+        if self._thread is not None:
+            return
+        if self.max_workers > 1:
+            self._executor = self._new_pool()
+        self._thread = threading.Thread(target=self._run, name="effect-matrix-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self)->None:
+        """
+        Stops the worker thread and its processes.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _new_pool(self)->ProcessPoolExecutor:
+        """
+        Helper creating the process pool (spawned processes do not inherit the app's threads and locks).
+        """
+        return ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def _replace_broken_pool(self)->None:
+        """
+        Helper recreating a broken process pool, or falling back to computing in the worker thread once MAX_POOL_RESTARTS is reached.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if self._pool_restarts < MAX_POOL_RESTARTS:
+            self._pool_restarts += 1
+            print("Effect matrix process pool broke; recreating it")
+            self._executor = self._new_pool()
+        else:
+            print("Effect matrix process pool broke again; computing in the worker thread from now on")
+            self._executor = None
+
+    def _run(self)->None:
+        """
+        Helper looping over the loaded networks while the app is idle.
+        """
+        while not self._stop.wait(DEFAULT_POLL_SECONDS):
+            if not self.is_idle():
+                continue
+            for network_id, cn in list(self.networks().items()):
+                matrix = cn.effect_matrix
+                if not matrix.n_pending():
+                    continue
+                try:
+                    self._refresh(matrix)
+                except BrokenProcessPool as e:
+                    print(f"Error while computing the effect matrix of {network_id}: {e}")
+                    self._replace_broken_pool()
+                    continue
+                except Exception as e:
+                    print(f"Error while computing the effect matrix of {network_id}: {e}")
+                    continue
+                if not matrix.n_pending() and self.on_refresh is not None:
+                    self.on_refresh(network_id, matrix)
+                if not self.is_idle():
+                    break
+
+    def _refresh(self, matrix:EffectMatrix)->None:
+        """
+        Helper computing the pending pairs of a matrix, in parallel chunks if there is a process pool, until the app stops being idle.
+        """
+        bn, graph_version, tasks = matrix.pending_tasks()
+        if self._executor is None:
+            for task in tasks:
+                if not self.is_idle() or self._stop.is_set():
+                    return
+                matrix.store(graph_version, effect_rows(bn, [task]))
+            return
+
+        n_chunks = min(len(tasks), self.max_workers * 4)
+        futures = {self._executor.submit(effect_rows, bn, tasks[i::n_chunks]) for i in range(n_chunks)}
+        while futures:
+            done, futures = wait(futures, timeout=DEFAULT_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                if not future.cancelled():
+                    matrix.store(graph_version, future.result())
+            if (not self.is_idle() or self._stop.is_set()) and futures:
+                for future in futures:
+                    future.cancel()
+                futures = {future for future in futures if not future.cancelled()}
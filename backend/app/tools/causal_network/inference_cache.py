@@ -0,0 +1,140 @@
+import pyAgrum as gum
+
+import threading
+from typing import Dict, Iterable
+
+from app.tools.causal_network.approximate_inference import mutilate, cpt_bytes, junction_tree_bytes
+
+class InferenceCache:
+    """
+    Keeps compiled exact inference engines (pyAgrum.LazyPropagation) for one causal network so repeated queries on an unchanged graph reuse the same junction tree.
+
+    One engine is compiled per intervention: the observational engine (key None) and one engine per treatment on the graph with the arcs into that treatment cut.
+    Interventions on a node without parents share the observational engine. Each engine works on its own copy of the network, so edits to the live network never
+    reach a compiled engine; instead invalidate() drops the engines whose graph an edit actually changed.
+    Requests are served on several threads, so each engine has a lock held from setting the evidence to reading the posterior,
+    and engines are compiled under the network's lock so they never copy a half-applied edit.
+
+    attributes:
+    - bn (gum.BayesNet): the live network the engines are compiled from.
+    - network_lock (threading.RLock): the lock held while the live network is edited.
+    - engines (dict): treatment name (or None) -> (network copy, LazyPropagation, lock, estimated bytes of the copy and its clique tables).
+    - compilations (int): number of engines compiled so far (useful to check reuse).
+
+    Methods:
+    - engine
+    - posterior
+    - interventional_posterior
+    - invalidate
+    - clear
+    - nbytes
+    """
+    def __init__(self, bn:gum.BayesNet, network_lock:threading.RLock=None)->None:
+        """
+        Constructor for a new inference cache over a network.
+        """
+        self.bn = bn
+        self.network_lock = network_lock or threading.RLock()
+        self.engines = {}
+        self.compilations = 0
+        self._lock = threading.Lock()
+
+    def engine(self, doing:str=None)->tuple[gum.LazyPropagation, threading.Lock]:
+        """
+        Returns the compiled engine for an intervention on doing (or for observational queries if doing is None), compiling it on first use,
+        with the lock to hold while using it.
+        """
+        # the network lock is taken first, in the same order as edits that invalidate the cache
+        with self.network_lock, self._lock:
+            if doing is not None and len(self.bn.parents(doing)) == 0:
+                doing = None
+            if doing not in self.engines:
+                bn = gum.BayesNet(self.bn) if doing is None else mutilate(self.bn, doing)
+                ie = gum.LazyPropagation(bn)
+                self.engines[doing] = (bn, ie, threading.Lock(), cpt_bytes(bn) + junction_tree_bytes(bn))
+                self.compilations += 1
+            _, ie, lock, _ = self.engines[doing]
+            return ie, lock
+
+    def posterior(self, on:str, evidence:Dict[str, str]=None)->gum.Potential:
+        """
+        Returns the observational posterior P(on | evidence) from the cached observational engine (see interventional_posterior for the potential's variables).
+        """
+        bn = self.bn
+        ie, lock = self.engine()
+        with lock:
+            ie.setTargets({on})
+            ie.setEvidence(evidence or {})
+            ie.makeInference()
+            posterior = ie.posterior(on).toarray().tolist()
+
+        effect = gum.Potential()
+        effect.add(bn.variable(on))
+        effect.fillWith(posterior)
+        effect._model = bn
+        return effect
+
+    def interventional_posterior(self, on:str, doing:str, knowing=None, values:Dict[str, str]=None)->gum.Potential:
+        """
+        Returns P(on | do(doing), knowing) from the cached engine of the mutilated graph.
+        When values has no entry for doing the result holds one distribution of on per value of doing; every knowing variable needs an entry in values.
+
+        The returned potential refers to the variables of the live network, so it stays valid after the engine is dropped. Like pyAgrum's engines,
+        it keeps that network alive (_model), so it also stays valid when the network is replaced (ex. relearned) while the potential is in use.
+        """
+        values = values or {}
+        knowing = set(knowing or [])
+        missing = [k for k in knowing if k not in values]
+        if missing:
+            raise ValueError(f"Exact estimates from the inference cache need a value for every conditioning variable; missing {missing}")
+
+        bn = self.bn
+        ie, lock = self.engine(doing)
+        treatment_labels = [values[doing]] if doing in values else list(bn.variable(doing).labels())
+        posteriors = []
+        with lock:
+            # only the outcome is targeted, so the propagation skips the cliques it does not need
+            ie.setTargets({on})
+            for treatment_label in treatment_labels:
+                evidence = {k: values[k] for k in knowing}
+                evidence[doing] = treatment_label
+                ie.setEvidence(evidence)
+                ie.makeInference()
+                posteriors.extend(ie.posterior(on).toarray().tolist())
+
+        effect = gum.Potential()
+        effect.add(bn.variable(on))
+        if doing not in values:
+            effect.add(bn.variable(doing))
+        effect.fillWith(posteriors)
+        effect._model = bn
+        return effect
+
+    def invalidate(self, arcs:Iterable[tuple[str, str]])->None:
+        """
+        Drops the engines whose graph changed after the given arcs (source, target) were added to or removed from the live network.
+        An engine for an intervention on a node keeps its junction tree when every edited arc points into that node, since those arcs are cut anyway.
+        """
+        targets = {target for _, target in arcs}
+        if not targets:
+            return
+        with self._lock:
+            for doing in list(self.engines):
+                if doing is None or targets != {doing}:
+                    del self.engines[doing]
+
+    def clear(self, bn:gum.BayesNet=None)->None:
+        """
+        Drops every compiled engine, optionally switching to a new live network.
+        """
+        with self._lock:
+            if bn is not None:
+                self.bn = bn
+            self.engines = {}
+
+    def nbytes(self)->int:
+        """
+        Returns an estimate of the memory held by the compiled engines (their network copies and clique tables).
+        """
+        with self._lock:
+            return sum(engine[3] for engine in self.engines.values())
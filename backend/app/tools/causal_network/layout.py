@@ -0,0 +1,214 @@
+import pyAgrum as gum
+
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+# vertical distance between layers and minimal horizontal distance between nodes of a layer (cytoscape model units)
+DEFAULT_LAYER_SPACING = 120
+DEFAULT_NODE_SPACING = 150
+
+# barycenter sweeps (down then up) of the crossing reduction
+DEFAULT_SWEEPS = 4
+
+def assign_layers(nodes:List[str], arcs:List[tuple[str, str]])->Dict[str, int]:
+    """
+    Assigns each node of a DAG to a layer: 0 for root nodes, else one more than its deepest parent (longest path layering).
+    """
+    parents = defaultdict(list)
+    children = defaultdict(list)
+    for source, target in arcs:
+        parents[target].append(source)
+        children[source].append(target)
+    n_parents = {node: len(parents[node]) for node in nodes}
+    layers = {}
+    stack = [node for node in nodes if n_parents[node] == 0]
+    for node in stack:
+        layers[node] = 0
+    while stack:
+        node = stack.pop()
+        for child in children[node]:
+            layers[child] = max(layers.get(child, 0), layers[node] + 1)
+            n_parents[child] -= 1
+            if n_parents[child] == 0:
+                stack.append(child)
+    if len(layers) != len(nodes):
+        raise ValueError("Layered layouts need an acyclic graph")
+    return layers
+
+def _place_layer(desired:List[float], spacing:float)->List[float]:
+    """
+    Helper placing the ordered nodes of a layer as close as possible to their desired x while keeping them spacing apart.
+    """
+    placed = []
+    for x in desired:
+        placed.append(x if not placed else max(x, placed[-1] + spacing))
+    # the forward pass only pushes right, so recentre the layer on its desired positions
+    shift = (sum(desired) - sum(placed)) / len(placed) if placed else 0
+    return [x + shift for x in placed]
+
+def layered_layout(nodes:List[str], arcs:List[tuple[str, str]], layer_spacing:float=DEFAULT_LAYER_SPACING,
+                   node_spacing:float=DEFAULT_NODE_SPACING, sweeps:int=DEFAULT_SWEEPS)->Dict[str, dict]:
+    """
+    Computes a layered (Sugiyama) layout of a DAG: longest path layering, dummy nodes along arcs spanning several layers,
+    barycenter crossing reduction and barycenter coordinate assignment.
+
+    :param nodes: node names
+    :param arcs: (source, target) arcs
+    :param layer_spacing: vertical distance between layers
+    :param node_spacing: minimal horizontal distance between nodes of a layer
+    :param sweeps: number of down and up barycenter sweeps
+
+    return: dict - node name -> {'x': x, 'y': y}
+    """
+    layers = assign_layers(nodes, arcs)
+    n_layers = max(layers.values()) + 1 if layers else 0
+
+    # split arcs spanning several layers with dummy nodes so every edge joins adjacent layers
+    up = defaultdict(list)
+    down = defaultdict(list)
+    order = [[] for _ in range(n_layers)]
+    for node in nodes:
+        order[layers[node]].append(node)
+    for source, target in arcs:
+        previous = source
+        for layer in range(layers[source] + 1, layers[target]):
+            dummy = ('dummy', source, target, layer)
+            order[layer].append(dummy)
+            up[dummy].append(previous)
+            down[previous].append(dummy)
+            previous = dummy
+        up[target].append(previous)
+        down[previous].append(target)
+
+    # crossing reduction: sort each layer by the mean position of its neighbors in the previous layer, sweeping down then up
+    position = {node: i for layer in order for i, node in enumerate(layer)}
+    for sweep in range(sweeps * 2):
+        downward = sweep % 2 == 0
+        neighbors = up if downward else down
+        for layer in (range(1, n_layers) if downward else range(n_layers - 2, -1, -1)):
+            def barycenter(node):
+                if not neighbors[node]:
+                    return position[node]
+                return sum(position[neighbor] for neighbor in neighbors[node]) / len(neighbors[node])
+            order[layer].sort(key=barycenter)
+            for i, node in enumerate(order[layer]):
+                position[node] = i
+
+    # coordinates: start from evenly spaced centred layers, then pull nodes towards their neighbors while keeping the order
+    x = {}
+    for layer in order:
+        for i, node in enumerate(layer):
+            x[node] = (i - (len(layer) - 1) / 2) * node_spacing
+    for sweep in range(sweeps * 2):
+        neighbors = up if sweep % 2 == 0 else down
+        for layer in order:
+            desired = [sum(x[n] for n in neighbors[node]) / len(neighbors[node]) if neighbors[node] else x[node] for node in layer]
+            for node, placed in zip(layer, _place_layer(desired, node_spacing)):
+                x[node] = placed
+
+    return {node: {'x': round(x[node], 1), 'y': layers[node] * layer_spacing} for node in nodes}
+
+def relayout(nodes:List[str], arcs:List[tuple[str, str]], previous:Dict[str, dict], layer_spacing:float=DEFAULT_LAYER_SPACING,
+             node_spacing:float=DEFAULT_NODE_SPACING)->Dict[str, dict]:
+    """
+    Incremental layered layout after an edit: nodes that stay in their layer keep their position, and nodes that are new or change layer
+    are placed at the mean x of their already placed neighbors, in the nearest free slot of their layer.
+
+    :param nodes: node names
+    :param arcs: (source, target) arcs
+    :param previous: node name -> {'x': x, 'y': y} of the layout before the edit
+
+    return: dict - node name -> {'x': x, 'y': y}
+    """
+    layers = assign_layers(nodes, arcs)
+    neighbors = defaultdict(list)
+    for source, target in arcs:
+        neighbors[source].append(target)
+        neighbors[target].append(source)
+
+    positions = {}
+    occupied = defaultdict(list)
+    moved = []
+    for node in nodes:
+        y = layers[node] * layer_spacing
+        if node in previous and previous[node]['y'] == y:
+            positions[node] = dict(previous[node])
+            occupied[y].append(previous[node]['x'])
+        else:
+            moved.append(node)
+
+    # place moved nodes top down so their parents are placed first
+    for node in sorted(moved, key=lambda node: layers[node]):
+        y = layers[node] * layer_spacing
+        placed = [positions[n]['x'] for n in neighbors[node] if n in positions]
+        if placed:
+            desired = sum(placed) / len(placed)
+        elif node in previous:
+            desired = previous[node]['x']
+        else:
+            desired = max(occupied[y], default=-node_spacing) + node_spacing
+        candidates = [desired] + [x + offset for x in occupied[y] for offset in (-node_spacing, node_spacing)]
+        free = [c for c in candidates if all(abs(c - x) >= node_spacing - 1e-9 for x in occupied[y])]
+        x = round(min(free, key=lambda c: abs(c - desired)), 1)
+        positions[node] = {'x': x, 'y': y}
+        occupied[y].append(x)
+    return positions
+
+class GraphLayout:
+    """
+    Layered layout of a network, cached per graph version.
+
+    The first layout is computed from scratch with layered_layout; later versions are laid out incrementally with relayout so that an edit only moves
+    the nodes it has to. Layouts can be seeded (ex. from a snapshot's metadata) so a restored network is drawn as it was saved.
+
+    attributes:
+    - graph_version (int): graph version of the cached positions (None before the first layout).
+    - positions (dict): node name -> {'x': x, 'y': y}.
+    - moved (set): nodes whose position changed with the last computed version.
+    - layer_spacing, node_spacing (float): spacing of the layout.
+
+    Methods:
+    - get
+    - seed
+    """
+    def __init__(self, layer_spacing:float=DEFAULT_LAYER_SPACING, node_spacing:float=DEFAULT_NODE_SPACING)->None:
+        """
+        Constructor for a new (empty) layout cache.
+        """
+        self.layer_spacing = layer_spacing
+        self.node_spacing = node_spacing
+        self.graph_version = None
+        self.positions = {}
+        self.moved = set()
+        self._lock = threading.Lock()
+
+    def seed(self, positions:Dict[str, dict], graph_version:int)->None:
+        """
+        Sets the cached positions of a graph version (ex. a layout saved with a snapshot).
+        """
+        with self._lock:
+            self.positions = {node: {'x': position['x'], 'y': position['y']} for node, position in positions.items()}
+            self.moved = set(self.positions)
+            self.graph_version = graph_version
+
+    def get(self, bn:gum.BayesNet, graph_version:int, relayout_all:bool=False)->Dict[str, dict]:
+        """
+        Returns the positions of a network version, computing them if that version is not cached.
+        :param bn: the network
+        :param graph_version: its graph version
+        :param relayout_all: lay the whole graph out from scratch instead of incrementally from the cached positions
+        """
+        with self._lock:
+            if graph_version == self.graph_version and not relayout_all and set(self.positions) == set(bn.names()):
+                return self.positions
+            nodes = [bn.variable(node).name() for node in bn.topologicalOrder()]
+            arcs = [(bn.variable(source).name(), bn.variable(target).name()) for source, target in bn.arcs()]
+            previous = self.positions
+            if previous and not relayout_all:
+                self.positions = relayout(nodes, arcs, previous, self.layer_spacing, self.node_spacing)
+            else:
+                self.positions = layered_layout(nodes, arcs, self.layer_spacing, self.node_spacing)
+            self.moved = {node for node, position in self.positions.items() if previous.get(node) != position}
+            self.graph_version = graph_version
+            return self.positions
@@ -4,41 +4,95 @@ import pandas as pd
 import pyAgrum.lib.explain as expl
 
 import os
+import threading
 from typing import List, Dict
 import matplotlib
 matplotlib.use('agg')
 import math
 from IPython.display import Math, Latex
 
+from app.tools.causal_network.approximate_inference import approximate_causal_impact, max_clique_size, mutilate, \
+    DEFAULT_ENGINE, DEFAULT_EPSILON, DEFAULT_MAX_SAMPLES, EXACT_INFERENCE_MAX_CLIQUE_SIZE
+from app.tools.causal_network.inference_cache import InferenceCache
+from app.tools.causal_network.effect_matrix import EffectMatrix
+from app.tools.causal_network.layout import GraphLayout
+from app.tools.causal_network.sensitivity import sensitivity_sweep
+from app.tools.causal_network.chunked_data import ChunkedDataset
+from app.tools.causal_network.count_tables import CountTableCache, chi2_independence
+from app.tools.causal_network.snapshots import SnapshotStore, load_snapshot
+import numpy as np
+from pyAgrum.lib.explain import _independenceListForPairs
+
 class CausalNetwork:
     """
     Causal network .
 
     attributes:
     - data_path (str): path to file where csv data is stored.
-    - df (pandas.DataFrame): dataframe holding data from data_path.
+    - df (pandas.DataFrame): dataframe holding data from data_path (None when the data is streamed in chunks).
+    - dataset (ChunkedDataset): distinct row counts of the data, used for learning.
+    - count_tables (CountTableCache): cached contingency tables of the data, shared by CPT fitting and independence tests.
     - structure_path (str): path to the bif file where the causal network structure is stored.
+    - snapshot_path (str): path to a binary snapshot to load the network from instead of structure_path.
     - assumptions (list): list of assumptions to use for learning the causal network.
     - learning_algorthm (str): the learning algorithm to use for the causal network.
+    - max_exact_clique_size (int): largest junction tree clique (in joint states) allowed before estimates fall back to approximate inference.
+    - graph_version (int): incremented every time the network structure changes (restoring a snapshot moves past both the current and the snapshot's version).
+    - snapshot_graph_version (int): graph version the network had when its last restored snapshot was saved (None if it was not restored from one).
+    - inference_cache (InferenceCache): compiled exact inference engines reused across queries on an unchanged graph.
+    - effect_matrix (EffectMatrix): all-pairs average causal effects of the network, refreshed incrementally after edits.
+    - layout (GraphLayout): layered layout of the graph, cached per graph version and saved with snapshots.
+    - lock (threading.RLock): held while the network is edited, relearned or restored, and while it is read by requests; long computations
+      (structure learning, approximate inference, sensitivity sweeps) work on copies taken under it.
     
     Methods:
     - set_causal_network
+    - save_snapshot
+    - restore_snapshot
     - learn_causal_network
     - set_network_cytoscape_elements
     - get_network_cytoscape_elements
     - get_network_df
+    - get_unique_values
+    - append_data
     - update_network
+    - fit_parameters
+    - get_posterior
+    - get_effect_matrix
+    - get_sensitivity_report
     - get_causal_estimate
+    - get_causal_estimate_potential
+    - get_causal_estimate_arrays
     - get_network_adjacency_matrix_str
     """
-    def __init__(self,data_path:str,structure_path:str=None,assumptions:dict=None, treatment:str=None, outcome:str=None)->None:
+    def __init__(self,data_path:str,structure_path:str=None,assumptions:dict=None, treatment:str=None, outcome:str=None,
+                 max_exact_clique_size:int=EXACT_INFERENCE_MAX_CLIQUE_SIZE, chunksize:int=None, snapshot_path:str=None)->None:
         """
         Constructor for a new causal network.
+        If chunksize is given the csv is streamed in chunks of that many rows and never held in memory as a whole.
         """
         self.data_path = data_path
-        self.df = pd.read_csv(data_path)
+        if chunksize:
+            self.df = None
+            self.dataset = ChunkedDataset(data_path, chunksize=chunksize)
+            self.dataset.ingest()
+        else:
+            self.df = pd.read_csv(data_path)
+            self.dataset = ChunkedDataset(data_path)
+            self.dataset.add(self.df)
+        self.count_tables = CountTableCache(self.dataset)
         self.structure_path = structure_path
+        self.snapshot_path = snapshot_path
         self.assumptions = assumptions
+        self.max_exact_clique_size = max_exact_clique_size
+        self.graph_version = 0
+        self.snapshot_graph_version = None
+        self.inference_cache = None
+        self.effect_matrix = None
+        self.layout = GraphLayout()
+        self.lock = threading.RLock()
+        self._identifications = {}
+        self._clique_size = None
         self.set_causal_network()
         self.set_network_cytoscape_elements()
         self.learning_algorthm = "greedy hill climbing"
@@ -57,10 +111,14 @@ class CausalNetwork:
 
     def set_causal_network(self)->None:
         """
-        Sets this networks causal network to a gum.BayNet based on a structure_path or learning algorithm.
+        Sets this networks causal network to a gum.BayNet based on a snapshot_path, structure_path or learning algorithm.
         """
-        if self.structure_path:
+        if self.snapshot_path:
+            bn, header = load_snapshot(self.snapshot_path)
+            self._set_snapshot(bn, header)
+        elif self.structure_path:
             self.causal_network = gum.loadBN(self.structure_path)
+            self._new_graph_version()
         else:
             self.learn_causal_network()    
 
@@ -68,8 +126,7 @@ class CausalNetwork:
         """
         Sets this networks causal network to a gum.BayNet based on a learning algorithm (currently pyAgrum default), this network's data, and this network's assumptions (if any)
         """
-        df = pd.read_csv(self.data_path)
-        learner = gum.BNLearner(df)
+        learner = self.dataset.learner()
         if self.assumptions:
             for assumption_type in self.assumptions.keys():
                 if assumption_type == 'learning_order':
@@ -79,17 +136,88 @@ class CausalNetwork:
                     pass
         learner.useScoreBIC()
         learner.useSmoothingPrior(1e-5)
-        self.causal_network = learner.learnBN()
+        # learning only reads the data, so edits and queries go on until the learned network is swapped in
+        bn = learner.learnBN()
+        with self.lock:
+            self.causal_network = bn
+            self._new_graph_version()
+
+    def save_snapshot(self, store:SnapshotStore, snapshot_id:str=None)->dict:
+        """
+        Saves this network (structure, CPTs, graph version and layout) to a snapshot store.
+        :param store: the snapshot store
+        :param snapshot_id: id of the snapshot (a new time based id by default; an existing snapshot with this id is replaced)
+
+        return: dict - summary of the saved snapshot
+        """
+        with self.lock:
+            metadata = {'layout': self.layout.get(self.causal_network, self.graph_version)}
+            return store.save(self.causal_network, self.graph_version, snapshot_id=snapshot_id, metadata=metadata)
+
+    def restore_snapshot(self, store:SnapshotStore, snapshot_id:str)->dict:
+        """
+        Replaces this network with a snapshot from a snapshot store.
+
+        return: dict - the snapshot header
+        """
+        bn, header = store.load(snapshot_id)
+        with self.lock:
+            self._set_snapshot(bn, header)
+            self.set_network_cytoscape_elements()
+        return header
+
+    def _set_snapshot(self, bn:gum.BayesNet, header:dict)->None:
+        """
+        Helper switching to a network loaded from a snapshot and taking over its layout.
+        The graph version moves past both the current and the snapshot's version, so versions stay increasing and unique
+        (caches and clients trust a matching version); the snapshot's own version is kept in snapshot_graph_version.
+        """
+        self.causal_network = bn
+        self.snapshot_graph_version = header['graph_version']
+        self._new_graph_version(graph_version=max(self.graph_version, header['graph_version']) + 1)
+        if header['metadata'].get('layout'):
+            self.layout.seed(header['metadata']['layout'], self.graph_version)
 
-    def set_network_cytoscape_elements(self)->None:
+    def _new_graph_version(self, arcs:list[tuple[str, str]]=None, graph_version:int=None)->None:
+        """
+        Helper to bump the graph version after a structure change.
+        :param arcs: the (source, target) arcs that were added or removed; if None the whole network was replaced and every compiled engine is dropped.
+        :param graph_version: version to switch to (ex. a snapshot's) instead of the next one
+        """
+        self.graph_version = self.graph_version + 1 if graph_version is None else graph_version
+        self._identifications = {}
+        self._clique_size = None
+        if self.inference_cache is None:
+            self.inference_cache = InferenceCache(self.causal_network, self.lock)
+        elif arcs is None:
+            self.inference_cache.clear(self.causal_network)
+        else:
+            self.inference_cache.invalidate(arcs)
+        if self.effect_matrix is None:
+            self.effect_matrix = EffectMatrix(self.causal_network, self.graph_version)
+        else:
+            self.effect_matrix.invalidate(self.causal_network, self.graph_version, arcs)
+
+    def set_network_cytoscape_elements(self, relayout:bool=False)->None:
         """
         Sets this network's cytoscape elements to a list of dicts representing the network graph (translation function between pyAgrum and cytoscape graph representations).
+        Nodes are positioned with the cached layout of the current graph version.
+        :param relayout: lay the whole graph out again instead of only moving the nodes affected by the last edits
+        """
+        with self.lock:
+            self._set_network_cytoscape_elements(relayout)
+
+    def _set_network_cytoscape_elements(self, relayout:bool)->None:
+        """
+        Helper for set_network_cytoscape_elements, called with the lock held.
         """
         cytoscape_elements = []
+        positions = self.layout.get(self.causal_network, self.graph_version, relayout_all=relayout)
 
         for node_name in self.causal_network.names():
             cytoscape_elements.append({
-                'data': {'id': node_name, 'label': node_name}
+                'data': {'id': node_name, 'label': node_name},
+                'position': dict(positions[node_name])
             })
 
         for j in self.causal_network.arcs():
@@ -121,49 +249,121 @@ class CausalNetwork:
     def get_network_df(self,cols=None)->dict:
         """
         Returns the network's data frame for the underlying data associated with the network.
+        When the data is streamed, returns its distinct rows with their number of occurrences in a 'count' column instead.
         """
+        if self.df is None:
+            df = self.dataset.to_frame()
+            df['count'] = self.dataset.weights
+            return df[cols + ['count']] if cols else df
         if cols:
             return self.df[cols]
         return self.df
 
-    def _delete_edge(self,deletion):
+    def get_unique_values(self,cols=None)->dict:
+        """
+        Returns the potential values of each variable (all variables by default) without scanning the data.
+        """
+        return self.dataset.unique_values(cols)
+
+    def append_data(self, rows:List[Dict[str, str]])->int:
+        """
+        Appends rows to the network's data (and csv file), updating the counts used for learning and independence tests without re-reading the file.
+        :param rows: list of dicts of variable name -> value
+
+        return: int - number of rows in the data after appending
+        """
+        with self.lock:
+            appended = self.dataset.append(rows)
+            if self.df is not None:
+                self.df = pd.concat([self.df, appended.astype(self.df.dtypes.to_dict())], ignore_index=True)
+            return self.dataset.n_rows()
+
+    def _delete_edge(self,deletion)->bool:
         """
         helper method for update network -- deletes an edge from the network
+        return: bool - whether the edge was deleted
         """
         try:
             source_index = self.causal_network.idFromName(deletion['data']['source'])
             target_index = self.causal_network.idFromName(deletion['data']['target'])
             if self.causal_network.existsArc(source_index, target_index):
                 self.causal_network.eraseArc(source_index, target_index)
+                return True
         except Exception as e:
             print(f"Error encountered for deletion: {deletion}; {e}")
+        return False
 
-    def _add_edge(self,addition):
+    def _add_edge(self,addition)->bool:
         """
         helper method for update network -- adds an edge to the network
+        return: bool - whether the edge was added (not if it already existed or would create a cycle)
         """
         try:
             source_index = self.causal_network.idFromName(addition['data']['source'])
             target_index = self.causal_network.idFromName(addition['data']['target'])
             if not self.causal_network.existsArc(source_index, target_index):
                 self.causal_network.addArc(source_index, target_index)
+                return True
         except Exception as e:
             print(f"Error encountered for addition: {addition}; {e}")
+        return False
 
-    def update_network(self, changes:List[Dict[str, any]])->None:
+    def update_network(self, changes:List[Dict[str, any]])->List[Dict[str, any]]:
         """
         Updates the edges in the network.
         :param change: a list of updates to make to the networ
             - example format: {'data': {'source': source_name, 'target': target_name}}
+
+        return: list - the changes that were applied (rejected and no-op changes leave the network and its graph version untouched)
         """
-        if changes:
-            for change in changes:
-                if 'deletion' in change:
-                    self._delete_edge(change['deletion'])
-                else:
-                    self._add_edge(change['addition'])
-        
-        self.set_network_cytoscape_elements()
+        arcs = []
+        applied = []
+        with self.lock:
+            if changes:
+                for change in changes:
+                    if 'deletion' in change:
+                        changed = self._delete_edge(change['deletion'])
+                        edge = change['deletion']
+                    else:
+                        changed = self._add_edge(change['addition'])
+                        edge = change['addition']
+                    if changed:
+                        arcs.append((edge['data']['source'], edge['data']['target']))
+                        applied.append(change)
+
+            if arcs:
+                # the edited children's CPTs are re-estimated from the data for their new parents
+                self.fit_parameters({target for _, target in arcs})
+                self._new_graph_version(arcs)
+            self.set_network_cytoscape_elements()
+        return applied
+
+    def fit_parameters(self, nodes=None, prior:float=1e-5, bn:gum.BayesNet=None)->None:
+        """
+        Estimates the CPTs of the network from the data's cached count tables (maximum likelihood with a smoothing prior).
+        :param nodes: names of the nodes to fit (default all); nodes whose family is not fully in the data keep their CPT
+        :param prior: pseudo-count added to every cell
+        :param bn: network to fit (default this network) -- ex. an edited copy of it
+        """
+        with self.lock:
+            bn = self.causal_network if bn is None else bn
+            nodes = bn.names() if nodes is None else nodes
+            for node in nodes:
+                cpt = bn.cpt(node)
+                # numpy axes of a pyAgrum potential are in reverse order of its names
+                family = list(reversed(cpt.names))
+                if any(var not in self.dataset.categories for var in family):
+                    continue
+                table = self.count_tables.counts(family).astype(float)
+                for axis, var in enumerate(family):
+                    # reorder the data's codes to the network's labels (labels absent from the data count 0)
+                    labels = self.dataset.categories[var]
+                    index = [labels.index(label) if label in labels else len(labels) for label in bn.variable(var).labels()]
+                    padding = np.zeros(table.shape[:axis] + (1,) + table.shape[axis + 1:])
+                    table = np.take(np.concatenate([table, padding], axis=axis), index, axis=axis)
+                table += prior
+                table /= table.sum(axis=-1, keepdims=True)
+                cpt.fillWith(table.ravel().tolist())
     
     def _reformat_pandas_series_dict(self,old_dict)->dict:
         """
@@ -176,23 +376,178 @@ class CausalNetwork:
             new_dict[outer_key][inner_key] = value
         return new_dict
 
-    def get_causal_estimate(self,on, doing, knowing=None, values=None)->tuple[dict, str,str]:
+    def get_causal_estimate(self,on, doing, knowing=None, values=None, method:str='auto', engine:str=DEFAULT_ENGINE,
+                            epsilon:float=DEFAULT_EPSILON, max_samples:int=DEFAULT_MAX_SAMPLES, max_time:float=None)->tuple[dict, str, str, dict]:
         """
-        Estimates a causal estimate between two given variables (wrapper for pyAgrum.causal.causalImpact).
+        Estimates a causal estimate between two given variables (wrapper for pyAgrum.causal.causalImpact, or an approximate engine on the mutilated graph).
         
         :param on: outcome variable
         :param doing: treatment variable
         :param knowing: conditioning variables
         :param values: values for the doing and knowing variables
+        :param method: 'exact', 'approximate' or 'auto' (exact unless the junction tree exceeds max_exact_clique_size)
+        :param engine: approximate engine -- 'loopy', 'gibbs', 'importance', 'weighted' or 'montecarlo'
+        :param epsilon: stopping criterion of the approximate engine
+        :param max_samples: maximum number of iterations of the approximate engine
+        :param max_time: maximum number of seconds for the approximate engine, if any
 
-        return: tuple[dict, str] - causal estimate dict and string of estimate explanation
+        return: tuple[dict, str, str, dict] - causal estimate dict, string of estimate explanation, latex formula and 95% confidence intervals (None for exact, loopy and gibbs estimates)
         """
-        # TODO this implementation is bad as it instantiates a new causal model each time
-        # TODO outcomes suggest this could be wrong implementation and directions aren't being set for graph -- test further
-        causal_model = csl.CausalModel(self.causal_network)
-        formula, effect, explanation = csl.causalImpact(causal_model, on, doing, knowing, values)
+        effect, explanation, formula, intervals = self.get_causal_estimate_potential(on, doing, knowing, values, method=method, engine=engine,
+                                                                                     epsilon=epsilon, max_samples=max_samples, max_time=max_time)
         effect = self._reformat_pandas_series_dict(dict(effect.topandas().round(decimals=3)))
-        return effect, explanation, formula.toLatex()
+        return effect, explanation, formula, intervals
+
+    def get_causal_estimate_arrays(self,on, doing, knowing=None, values=None, method:str='auto', engine:str=DEFAULT_ENGINE,
+                                   epsilon:float=DEFAULT_EPSILON, max_samples:int=DEFAULT_MAX_SAMPLES, max_time:float=None)->tuple[dict, str, str, dict]:
+        """
+        Same as get_causal_estimate, but the estimate is returned in columnar form straight from the estimate's numpy array (no pandas round trip).
+
+        return: tuple[dict, str, str, dict] - causal estimate columns, string of estimate explanation, latex formula and 95% confidence intervals
+            - causal estimate columns: {'variables': variable names, one per axis, outcome last, 'labels': labels of each variable, 'probabilities': numpy array}
+        """
+        effect, explanation, formula, intervals = self.get_causal_estimate_potential(on, doing, knowing, values, method=method, engine=engine,
+                                                                                     epsilon=epsilon, max_samples=max_samples, max_time=max_time)
+        # numpy axes of a pyAgrum potential are in reverse order of its names
+        variables = list(reversed(effect.names))
+        columns = {
+            'variables': variables,
+            'labels': [list(self.causal_network.variable(var).labels()) for var in variables],
+            'probabilities': effect.toarray().round(decimals=3),
+        }
+        return columns, explanation, formula, intervals
+
+    def get_causal_estimate_potential(self,on, doing, knowing=None, values=None, method:str='auto', engine:str=DEFAULT_ENGINE,
+                                      epsilon:float=DEFAULT_EPSILON, max_samples:int=DEFAULT_MAX_SAMPLES, max_time:float=None)->tuple[gum.Potential, str, str, dict]:
+        """
+        Same as get_causal_estimate, but the estimate is returned as an unrounded pyAgrum.Potential over the outcome (and the treatment when it has no value).
+
+        return: tuple[gum.Potential, str, str, dict] - causal estimate, string of estimate explanation, latex formula and 95% confidence intervals
+        """
+        with self.lock:
+            if method == 'auto':
+                method = 'approximate' if self._max_clique_size() > self.max_exact_clique_size else 'exact'
+            if method == 'approximate':
+                # sampling runs on the mutilated copy, outside the lock
+                bn, mutilated = self.causal_network, mutilate(self.causal_network, doing)
+
+        if method == 'approximate':
+            effect, explanation, formula, intervals = approximate_causal_impact(bn, on, doing, knowing, values,
+                                                                                 engine=engine, epsilon=epsilon,
+                                                                                 max_samples=max_samples, max_time=max_time, mutilated=mutilated)
+            return effect, explanation, formula, intervals
+        elif method != 'exact':
+            raise ValueError(f"Unknown estimation method '{method}'; expected 'exact', 'approximate' or 'auto'")
+
+        if any(k not in (values or {}) for k in (knowing or [])):
+            # joint tables over unvalued conditioning variables are left to pyAgrum.causal
+            with self.lock:
+                causal_model = csl.CausalModel(self.causal_network)
+                formula, effect, explanation = csl.causalImpact(causal_model, on, doing, knowing, values)
+            return effect, explanation, formula.toLatex(), None
+
+        formula, explanation = self._identify(on, doing, knowing)
+        effect = self.inference_cache.interventional_posterior(on, doing, knowing, values)
+        return effect, explanation, formula, None
+
+    def _max_clique_size(self)->int:
+        """
+        Helper returning the largest junction tree clique of the current graph, triangulated once per graph version.
+        """
+        if self._clique_size is None:
+            self._clique_size = max_clique_size(self.causal_network)
+        return self._clique_size
+
+    def _identify(self, on:str, doing:str, knowing=None)->tuple[str, str]:
+        """
+        Helper returning the latex identification formula and explanation for a causal query, cached for the current graph version.
+        Follows the identification steps of pyAgrum.causal.causalImpact (d-separation, backdoor, frontdoor, then do-calculus) but never evaluates
+        the formula: the estimate itself comes from the inference cache.
+        """
+        with self.lock:
+            key = (on, doing, frozenset(knowing or []))
+            if key not in self._identifications:
+                self._identifications[key] = self._identify_formula(on, doing, set(knowing or []))
+            return self._identifications[key]
+
+    def _identify_formula(self, on:str, doing:str, knowing:set)->tuple[str, str]:
+        """
+        Helper for _identify, called with the lock held.
+        """
+        causal_model = csl.CausalModel(self.causal_network)
+        bn = causal_model.causalBN()
+        independent = self.causal_network.isIndependent({doing}, {on}, knowing)
+        backdoor = frontdoor = None
+        if not independent and not knowing:
+            # door sets in node order, as pyAgrum.causal writes them
+            backdoor = causal_model.backDoor(doing, on, withNames=False)
+            frontdoor = causal_model.frontDoor(doing, on, withNames=False) if backdoor is None else None
+
+        if independent:
+            explanation = "No causal effect of X on Y, because they are d-separated (conditioning on the observed variables if any)."
+            root = csl.ASTposteriorProba(bn, {on}, knowing)
+        elif backdoor is not None:
+            backdoor = [bn.variable(node).name() for node in backdoor]
+            explanation = f"backdoor {backdoor} found."
+            root = csl.ASTsum(backdoor, csl.ASTmult(csl.ASTposteriorProba(bn, {on}, {doing, *backdoor}), csl.ASTjointProba(backdoor)))
+        elif frontdoor is not None:
+            frontdoor = [bn.variable(node).name() for node in frontdoor]
+            explanation = f"frontdoor {frontdoor} found."
+            root = csl.ASTsum(frontdoor, csl.ASTmult(csl.ASTposteriorProba(bn, set(frontdoor), {doing}),
+                                                     csl.ASTsum([doing], csl.ASTmult(csl.ASTposteriorProba(bn, {on}, {doing, *frontdoor}),
+                                                                                     csl.ASTjointProba([doing])))))
+        else:
+            try:
+                root = csl.doCalculusWithObservation(causal_model, {on}, {doing}, knowing).root
+            except csl.HedgeException as e:
+                raise ValueError(f"Causal effect of {doing} on {on} is not identifiable: {e.message}")
+            explanation = "Do-calculus computations"
+        formula = csl.CausalFormula(causal_model, root, {on}, {doing}, knowing)
+        return formula.toLatex(), explanation
+
+    def get_posterior(self, on:str, evidence:Dict[str, str]=None)->dict:
+        """
+        Returns the observational distribution of a variable given evidence, computed with the compiled inference engine of the current graph.
+
+        :param on: target variable
+        :param evidence: dict of variable name -> observed value
+
+        return: dict - probability of each value of the target variable
+        """
+        posterior = self.inference_cache.posterior(on, evidence)
+        return {label: round(p, 3) for label, p in zip(self.causal_network.variable(on).labels(), posterior.toarray().tolist())}
+
+    def get_effect_matrix(self, compute_pending:bool=False)->dict:
+        """
+        Returns the all-pairs average causal effect matrix of the network (see EffectMatrix).
+
+        :param compute_pending: compute the pairs that are still pending (after an edit) before returning, rather than returning them as None
+
+        return: dict - {'variables': names, 'effects': effects[treatment][outcome], 'graphVersion': graph version, 'pending': number of pending pairs}
+        """
+        if compute_pending:
+            self.effect_matrix.refresh()
+        return self.effect_matrix.to_dict()
+
+    def get_sensitivity_report(self, treatment:str, outcome:str, candidates:List[Dict[str, str]]=None, executor=None, n_chunks:int=1)->dict:
+        """
+        Returns how robust the causal effect of treatment on outcome is to single-edge additions, deletions and reversals (see sensitivity_sweep).
+        The baseline comes from the compiled engine of the current graph and the perturbed copies are refitted from the cached count tables.
+
+        :param treatment: treatment variable
+        :param outcome: outcome variable
+        :param candidates: list of {'type': 'addition'|'deletion'|'reversal', 'source': name, 'target': name} (default: every perturbation among the outcome's ancestors)
+        :param executor: concurrent.futures executor to evaluate the perturbations on (the calling thread if None)
+        :param n_chunks: number of tasks to split the perturbations into for the executor
+
+        return: dict - the baseline estimate and effect, the perturbations ranked by change and the skipped candidates
+        """
+        with self.lock:
+            # the sweep runs on a copy, so the network can be edited meanwhile
+            bn = gum.BayesNet(self.causal_network)
+            baseline = self.inference_cache.interventional_posterior(outcome, treatment).toarray()
+        return sensitivity_sweep(bn, treatment, outcome, baseline, lambda nodes, bn: self.fit_parameters(nodes, bn=bn),
+                                 candidates=candidates, executor=executor, n_chunks=n_chunks)
 
     def get_independence_test_dict(self,target=None):
         """
@@ -205,11 +560,37 @@ class CausalNetwork:
         Returns:
         dict: A dictionary containing the results of independence tests for pairs of variables.
         """
-        if target:
-            ind_dict = expl.independenceListForPairs(self.causal_network,self.data_path,target=target)
-        else:
-            ind_dict = expl.independenceListForPairs(self.causal_network,self.data_path)
-        return ind_dict
+        return dict(self.iter_independence_tests(self.get_independence_propositions(target)))
+
+    def get_independence_propositions(self,target=None)->list[tuple[str, str, tuple]]:
+        """
+        Returns the (x, y, conditioning set) independence propositions implied by the graph for every non arc, as tested by get_independence_test_dict.
+        :param target: only propositions given a subset of the markov blanket of this variable
+        """
+        with self.lock:
+            return _independenceListForPairs(self.causal_network, target)
+
+    def iter_independence_tests(self,propositions:list[tuple[str, str, tuple]]):
+        """
+        Yields ((x, y, conditioning set), p-value) for each proposition as its test completes.
+        Same chi2 tests as expl.independenceListForPairs, but on cached count tables rather than re-reading the csv.
+        """
+        for x, y, knowing in propositions:
+            _, p_value = chi2_independence(self.count_tables.counts([x, y, *knowing]))
+            yield (x, y, knowing), p_value
+
+    def get_independence_test_columns(self,target=None)->dict:
+        """
+        Same as get_independence_test_dict, in columnar form.
+
+        return: dict - {'independence_assumption': list of variable pairs, 'conditioning_set': list of variable lists, 'value': numpy array of p-values}
+        """
+        ind_dict = self.get_independence_test_dict(target)
+        return {
+            'independence_assumption': [[x, y] for x, y, _ in ind_dict],
+            'conditioning_set': [list(knowing) for _, _, knowing in ind_dict],
+            'value': np.fromiter(ind_dict.values(), dtype=float, count=len(ind_dict)),
+        }
     
     def get_network_adjacency_matrix_str(self)->str:
         """
@@ -236,5 +617,6 @@ class CausalNetwork:
         
         return: list[str] - list of the markov blank for the target node
         '''
-        target_mb = gum.MarkovBlanket(self.causal_network,target)
-        return [self.causal_network.variable(node).name() for node in target_mb.nodes()]
\ No newline at end of file
+        with self.lock:
+            target_mb = gum.MarkovBlanket(self.causal_network,target)
+            return [self.causal_network.variable(node).name() for node in target_mb.nodes()]
\ No newline at end of file
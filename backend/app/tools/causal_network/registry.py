@@ -0,0 +1,164 @@
+import os
+import json
+import threading
+from collections import OrderedDict
+
+from app.tools.causal_network.network_pyagrum import CausalNetwork
+from app.tools.causal_network.approximate_inference import cpt_bytes
+from app.tools.causal_network.snapshots import SnapshotStore
+
+# memory budget of the loaded networks
+DEFAULT_MAX_BYTES = 2 * 1024**3
+
+# the current state of each network is autosaved to this snapshot after each edit and restored when the network is loaded
+AUTOSAVE_SNAPSHOT_ID = "autosave"
+
+class UnknownNetworkError(KeyError):
+    """
+    Raised when a network id is not registered.
+    """
+
+def estimate_network_bytes(cn:CausalNetwork)->int:
+    """
+    Returns a rough estimate of the memory held by a loaded causal network (CPTs, data, count tables, compiled inference engines and effect matrix).
+    """
+    size = cpt_bytes(cn.causal_network) + cn.inference_cache.nbytes() + cn.effect_matrix.nbytes()
+    size += cn.dataset.patterns.nbytes + cn.dataset.weights.nbytes + cn.count_tables.nbytes()
+    if cn.df is not None:
+        size += int(cn.df.memory_usage(deep=True).sum())
+    return size
+
+class NetworkRegistry:
+    """
+    Registry of the causal networks served by the app.
+
+    Networks are registered by id with the arguments of their CausalNetwork, loaded on first access (restoring their autosave snapshot if any) and
+    evicted least recently used first when the loaded networks exceed the memory budget. An evicted network is autosaved first, so it comes back as it was.
+
+    attributes:
+    - snapshot_directory (str): directory holding one snapshot store per network.
+    - max_bytes (int): memory budget of the loaded networks.
+    - configs (dict): network id -> config (data_path, structure_path, description and other CausalNetwork arguments).
+    - networks (OrderedDict): network id -> loaded CausalNetwork, least recently used first.
+
+    Methods:
+    - register
+    - load_config
+    - get
+    - snapshot_store
+    - description
+    - list
+    - evict
+    """
+    def __init__(self, snapshot_directory:str, max_bytes:int=DEFAULT_MAX_BYTES)->None:
+        """
+        Constructor for a new (empty) network registry.
+        """
+        self.snapshot_directory = snapshot_directory
+        self.max_bytes = max_bytes
+        self.configs = {}
+        self.networks = OrderedDict()
+        self._snapshot_stores = {}
+        self._loading = {}
+        self._lock = threading.RLock()
+
+    def register(self, network_id:str, data_path:str, structure_path:str=None, description:str="", **kwargs)->None:
+        """
+        Registers a network without loading it.
+        :param network_id: id of the network, used in routes (/networks/<network_id>/...)
+        :param data_path: path to the csv data of the network
+        :param structure_path: path to the bif structure of the network (learned from the data if None)
+        :param description: description of the network given to the chat assistant
+        :param kwargs: other CausalNetwork arguments (ex. chunksize)
+        """
+        with self._lock:
+            self.configs[network_id] = dict(data_path=data_path, structure_path=structure_path, description=description, **kwargs)
+
+    def load_config(self, config_path:str)->None:
+        """
+        Registers every network of a json config file: {"<network_id>": {"data_path": ..., "structure_path": ..., "description": ...}, ...}.
+        Relative paths are resolved from the config file's directory.
+        """
+        base_directory = os.path.dirname(os.path.abspath(config_path))
+        with open(config_path) as file:
+            configs = json.load(file)
+        for network_id, config in configs.items():
+            for key in ('data_path', 'structure_path'):
+                if config.get(key):
+                    config[key] = os.path.join(base_directory, config[key])
+            self.register(network_id, **config)
+
+    def snapshot_store(self, network_id:str)->SnapshotStore:
+        """
+        Returns the snapshot store of a network.
+        """
+        if network_id not in self.configs:
+            raise UnknownNetworkError(network_id)
+        if network_id not in self._snapshot_stores:
+            self._snapshot_stores[network_id] = SnapshotStore(os.path.join(self.snapshot_directory, network_id))
+        return self._snapshot_stores[network_id]
+
+    def description(self, network_id:str)->str:
+        """
+        Returns the description of a network.
+        """
+        if network_id not in self.configs:
+            raise UnknownNetworkError(network_id)
+        return self.configs[network_id]['description']
+
+    def get(self, network_id:str)->CausalNetwork:
+        """
+        Returns a network, loading it on first access and evicting cold networks beyond the memory budget.
+        The network is built outside the registry's lock, so loading one network does not block requests to the others;
+        concurrent requests for a network that is loading wait for it instead of loading it again.
+        """
+        while True:
+            with self._lock:
+                if network_id not in self.configs:
+                    raise UnknownNetworkError(network_id)
+                if network_id in self.networks:
+                    self.networks.move_to_end(network_id)
+                    return self.networks[network_id]
+                loading = self._loading.get(network_id)
+                if loading is None:
+                    loading = self._loading[network_id] = threading.Event()
+                    config = {key: value for key, value in self.configs[network_id].items() if key != 'description'}
+                    store = self.snapshot_store(network_id)
+                    break
+            # another request is loading this network; if it fails, the next loop loads it again
+            loading.wait()
+
+        try:
+            if os.path.exists(store.path(AUTOSAVE_SNAPSHOT_ID)):
+                # the autosave replaces the bif structure or learning, so neither is run
+                print(f"Loading network {network_id} from snapshot: {AUTOSAVE_SNAPSHOT_ID}")
+                config['snapshot_path'] = store.path(AUTOSAVE_SNAPSHOT_ID)
+            else:
+                print(f"Loading network: {network_id}")
+            cn = CausalNetwork(**config)
+            with self._lock:
+                self.networks[network_id] = cn
+                while len(self.networks) > 1 and sum(estimate_network_bytes(n) for n in self.networks.values()) > self.max_bytes:
+                    self.evict(next(iter(self.networks)))
+            return cn
+        finally:
+            with self._lock:
+                del self._loading[network_id]
+            loading.set()
+
+    def evict(self, network_id:str)->None:
+        """
+        Autosaves and unloads a network.
+        """
+        with self._lock:
+            cn = self.networks.pop(network_id, None)
+            if cn is not None:
+                print(f"Evicting network: {network_id}")
+                cn.save_snapshot(self.snapshot_store(network_id), AUTOSAVE_SNAPSHOT_ID)
+
+    def list(self)->list[dict]:
+        """
+        Returns the id, description and load state of every registered network.
+        """
+        return [{"id": network_id, "description": config['description'], "loaded": network_id in self.networks}
+                for network_id, config in self.configs.items()]
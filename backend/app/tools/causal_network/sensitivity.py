@@ -0,0 +1,172 @@
+import pyAgrum as gum
+import numpy as np
+
+import math
+from concurrent.futures import Executor
+from typing import Callable, Dict, List
+
+from app.tools.causal_network.effect_matrix import average_causal_effect, interventional_distributions
+
+PERTURBATION_TYPES = ('addition', 'deletion', 'reversal')
+
+# digits effects and changes are rounded to before ranking
+CHANGE_DIGITS = 12
+
+def _names(bn:gum.BayesNet, nodes)->set[str]:
+    """
+    Helper turning node ids into names.
+    """
+    return {bn.variable(node).name() for node in nodes}
+
+def candidate_perturbations(bn:gum.BayesNet, treatment:str, outcome:str)->List[dict]:
+    """
+    Returns the default candidate set of a sensitivity sweep: the deletion and reversal of every arc among the ancestors of the outcome
+    (the only CPTs P(outcome | do(treatment)) depends on) and the addition of every missing arc between them, in both directions.
+    """
+    relevant = _names(bn, bn.ancestors(outcome)) | {outcome, treatment}
+    candidates = []
+    for source in sorted(relevant):
+        for target in sorted(relevant):
+            if source == target:
+                continue
+            if bn.existsArc(source, target):
+                candidates.append({'type': 'deletion', 'source': source, 'target': target})
+                candidates.append({'type': 'reversal', 'source': source, 'target': target})
+            elif not bn.existsArc(target, source):
+                candidates.append({'type': 'addition', 'source': source, 'target': target})
+    return candidates
+
+def perturb(bn:gum.BayesNet, perturbation:dict)->tuple[gum.BayesNet, set[str]]:
+    """
+    Returns a copy of the network with one edge added, deleted or reversed, and the nodes whose parents changed (their CPTs need refitting).
+    Raises ValueError if the perturbation does not apply (missing or existing arc, or a cycle).
+    """
+    kind, source, target = perturbation['type'], perturbation['source'], perturbation['target']
+    if kind not in PERTURBATION_TYPES:
+        raise ValueError(f"Unknown perturbation type: {kind}; expected one of {PERTURBATION_TYPES}")
+    forked = gum.BayesNet(bn)
+    if kind == 'addition':
+        if forked.existsArc(source, target) or forked.existsArc(target, source):
+            raise ValueError(f"{source} and {target} are already adjacent")
+        if target == source or target in _names(forked, forked.ancestors(source)):
+            raise ValueError(f"Adding {source}->{target} creates a cycle")
+        forked.addArc(source, target)
+        return forked, {target}
+    if not forked.existsArc(source, target):
+        raise ValueError(f"No arc {source}->{target}")
+    forked.eraseArc(source, target)
+    if kind == 'deletion':
+        return forked, {target}
+    # target->source closes a cycle if source is still an ancestor of target through another path
+    if source in _names(forked, forked.ancestors(target)):
+        raise ValueError(f"Reversing {source}->{target} creates a cycle")
+    forked.addArc(target, source)
+    return forked, {source, target}
+
+def _fitted_cpts(bn:gum.BayesNet, nodes:set[str])->Dict[str, tuple[list, np.ndarray]]:
+    """
+    Helper extracting the CPTs of nodes as (variable names, array) so they can be sent to another process.
+    """
+    return {node: (list(bn.cpt(node).names), bn.cpt(node).toarray()) for node in nodes}
+
+def _perturbed_distributions(bn:gum.BayesNet, treatment:str, outcome:str, specs:List[tuple[int, dict, dict]])->Dict[int, np.ndarray]:
+    """
+    Helper computing P(outcome | do(treatment)) under perturbations of a network, one copy at a time. Runs in worker processes, so it only uses its arguments.
+    :param specs: list of (candidate index, perturbation, refitted CPTs from _fitted_cpts)
+    """
+    results = {}
+    for i, perturbation, cpts in specs:
+        forked, _ = perturb(bn, perturbation)
+        for node, (names, table) in cpts.items():
+            cpt = forked.cpt(node)
+            # numpy axes are in reverse order of the names, which may differ from the fitted copy's
+            fitted_axes = list(reversed(names))
+            table = np.transpose(table, [fitted_axes.index(name) for name in reversed(cpt.names)])
+            cpt.fillWith(table.ravel().tolist())
+        results[i] = interventional_distributions(forked, treatment, [outcome])[outcome]
+    return results
+
+def sensitivity_sweep(bn:gum.BayesNet, treatment:str, outcome:str, baseline:np.ndarray, fit:Callable, candidates:List[dict]=None,
+                      executor:Executor=None, n_chunks:int=1)->dict:
+    """
+    Evaluates the causal estimate of treatment on outcome under single-edge perturbations of the network and ranks them by how much they move it.
+
+    Each perturbation works on its own copy of the network, whose edited CPTs are refitted with fit (which shares the network's cached count tables).
+    Perturbations that change no CPT the estimate depends on (the outcome's and its ancestors', except the treatment's which the intervention replaces)
+    reuse the baseline without inference. The others are evaluated in chunks, on the executor's processes when one is given: a chunk only carries the
+    perturbations and their refitted CPTs along with the base network, and each copy is built and dropped one at a time, so memory stays flat in the
+    number of candidates.
+
+    :param bn: the network
+    :param treatment: treatment variable
+    :param outcome: outcome variable
+    :param baseline: P(outcome | do(treatment)) on the network, one row per treatment value
+    :param fit: function(nodes, bn) refitting the CPTs of nodes in bn from the data
+    :param candidates: list of {'type': 'addition'|'deletion'|'reversal', 'source': name, 'target': name} (default candidate_perturbations)
+    :param executor: executor to spread the perturbations over (computed in the calling thread if None)
+    :param n_chunks: number of tasks to split the perturbations into for the executor
+
+    return: dict - the baseline estimate and effect, the perturbations ranked by change (largest total variation distance between the baseline and
+    perturbed distributions of the outcome under any intervention) and the skipped candidates
+    """
+    treatment_labels = list(bn.variable(treatment).labels())
+    outcome_labels = list(bn.variable(outcome).labels())
+    candidates = candidate_perturbations(bn, treatment, outcome) if candidates is None else candidates
+
+    results = {}
+    skipped = []
+    futures = []
+    chunk_size = max(1, math.ceil(len(candidates) / max(1, n_chunks)))
+    chunk = []
+
+    def evaluate(chunk):
+        if executor is None:
+            results.update(_perturbed_distributions(bn, treatment, outcome, chunk))
+        else:
+            futures.append(executor.submit(_perturbed_distributions, bn, treatment, outcome, chunk))
+
+    for i, perturbation in enumerate(candidates):
+        try:
+            forked, refit = perturb(bn, perturbation)
+        except (ValueError, gum.GumException) as e:
+            skipped.append({**perturbation, 'reason': str(e)})
+            continue
+        fit(refit, forked)
+        relevant = _names(forked, forked.ancestors(outcome)) | {outcome}
+        if not (refit - {treatment}) & relevant:
+            results[i] = baseline
+        else:
+            chunk.append((i, perturbation, _fitted_cpts(forked, refit)))
+        del forked
+        if len(chunk) >= chunk_size:
+            evaluate(chunk)
+            chunk = []
+    if chunk:
+        evaluate(chunk)
+    for future in futures:
+        results.update(future.result())
+
+    def estimate(distributions):
+        return {treatment_label: {outcome_label: round(float(p), 4) for outcome_label, p in zip(outcome_labels, row)}
+                for treatment_label, row in zip(treatment_labels, distributions)}
+
+    perturbations = []
+    # in candidate order, and with changes rounded past the float noise of computing in another process,
+    # so perturbations with the same change rank the same way however they were evaluated
+    for i, distributions in sorted(results.items(), key=lambda item: item[0]):
+        perturbations.append({
+            **candidates[i],
+            'effect': round(average_causal_effect(distributions), CHANGE_DIGITS),
+            'change': round(float((np.abs(distributions - baseline).sum(axis=1) / 2).max()), CHANGE_DIGITS),
+            'estimate': estimate(distributions),
+        })
+    perturbations.sort(key=lambda perturbation: perturbation['change'], reverse=True)
+
+    return {
+        'treatment': treatment,
+        'outcome': outcome,
+        'baseline': {'effect': average_causal_effect(baseline), 'estimate': estimate(baseline)},
+        'max_change': perturbations[0]['change'] if perturbations else 0.0,
+        'perturbations': perturbations,
+        'skipped': skipped,
+    }
@@ -0,0 +1,172 @@
+import pyAgrum as gum
+import numpy as np
+
+import os
+import json
+import time
+
+SNAPSHOT_EXTENSION = '.npz'
+
+def save_snapshot(bn:gum.BayesNet, file_path:str, graph_version:int=0, metadata:dict=None)->dict:
+    """
+    Saves a network (structure and CPTs) to a compact binary snapshot: a json header and every CPT as one flat float64 array, so loading needs no parsing.
+
+    :param bn: the network to save
+    :param file_path: path of the snapshot file (.npz)
+    :param graph_version: graph version of the network
+    :param metadata: extra json-serializable data to keep with the snapshot (ex. cached layouts)
+
+    return: dict - the snapshot header
+    """
+    variables = []
+    cpts = []
+    for node in sorted(bn.nodes()):
+        variable = bn.variable(node)
+        cpt = bn.cpt(node)
+        variables.append({
+            'name': variable.name(),
+            'description': variable.description(),
+            'labels': list(variable.labels()),
+            # parents in the order of the CPT's variables so the flat table can be refilled as is
+            'parents': list(cpt.names[1:]),
+        })
+        cpts.append(cpt.toarray().ravel())
+
+    header = {
+        'name': bn.property('name') if 'name' in bn.properties() else '',
+        'graph_version': graph_version,
+        'created': time.time(),
+        'n_nodes': bn.size(),
+        'n_arcs': bn.sizeArcs(),
+        'variables': variables,
+        'metadata': metadata or {},
+    }
+    header_bytes = np.frombuffer(json.dumps(header).encode('utf-8'), dtype=np.uint8)
+    with open(file_path, 'wb') as file:
+        np.savez(file, header=header_bytes, cpts=np.concatenate(cpts) if cpts else np.zeros(0))
+    return header
+
+def read_snapshot_header(file_path:str)->dict:
+    """
+    Returns the header of a snapshot without building its network.
+    """
+    with np.load(file_path) as snapshot:
+        return json.loads(snapshot['header'].tobytes().decode('utf-8'))
+
+def load_snapshot(file_path:str)->tuple[gum.BayesNet, dict]:
+    """
+    Loads a network saved with save_snapshot.
+
+    return: tuple[gum.BayesNet, dict] - the network and the snapshot header
+    """
+    with np.load(file_path) as snapshot:
+        header = json.loads(snapshot['header'].tobytes().decode('utf-8'))
+        cpts = snapshot['cpts']
+
+    bn = gum.BayesNet(header['name'])
+    for variable in header['variables']:
+        bn.add(gum.LabelizedVariable(variable['name'], variable['description'], variable['labels']))
+    for variable in header['variables']:
+        for parent in variable['parents']:
+            bn.addArc(parent, variable['name'])
+
+    offset = 0
+    for variable in header['variables']:
+        cpt = bn.cpt(variable['name'])
+        size = cpt.domainSize()
+        cpt.fillWith(cpts[offset:offset + size].tolist())
+        offset += size
+    return bn, header
+
+class SnapshotStore:
+    """
+    A directory of network snapshots.
+
+    attributes:
+    - directory (str): path to the directory holding the snapshot files.
+
+    Methods:
+    - path
+    - save
+    - load
+    - list
+    - latest
+    - export_bif
+    """
+    def __init__(self, directory:str)->None:
+        """
+        Constructor for a new snapshot store (creates the directory if needed).
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, snapshot_id:str)->str:
+        """
+        Returns the file path of a snapshot, refusing ids that would escape the store's directory.
+        """
+        if not snapshot_id or os.path.basename(snapshot_id) != snapshot_id or snapshot_id.startswith('.'):
+            raise ValueError(f"Invalid snapshot id: {snapshot_id}")
+        return os.path.join(self.directory, snapshot_id + SNAPSHOT_EXTENSION)
+
+    def save(self, bn:gum.BayesNet, graph_version:int=0, snapshot_id:str=None, metadata:dict=None)->dict:
+        """
+        Saves a network to the store, under a new time based id unless one is given (an existing snapshot with that id is replaced).
+
+        return: dict - summary of the saved snapshot
+        """
+        snapshot_id = snapshot_id or f"snapshot_{time.time_ns()}"
+        header = save_snapshot(bn, self.path(snapshot_id), graph_version, metadata)
+        return self._summary(snapshot_id, header)
+
+    def load(self, snapshot_id:str)->tuple[gum.BayesNet, dict]:
+        """
+        Loads a snapshot of the store.
+
+        return: tuple[gum.BayesNet, dict] - the network and the snapshot header
+        """
+        file_path = self.path(snapshot_id)
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"No snapshot with id {snapshot_id}")
+        return load_snapshot(file_path)
+
+    def _summary(self, snapshot_id:str, header:dict)->dict:
+        """
+        Helper summarizing a snapshot header for listings.
+        """
+        return {
+            'id': snapshot_id,
+            'name': header['name'],
+            'graph_version': header['graph_version'],
+            'created': header['created'],
+            'n_nodes': header['n_nodes'],
+            'n_arcs': header['n_arcs'],
+            'size': os.path.getsize(self.path(snapshot_id)),
+        }
+
+    def list(self)->list[dict]:
+        """
+        Returns a summary of every snapshot in the store, most recent first.
+        """
+        summaries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(SNAPSHOT_EXTENSION):
+                snapshot_id = file_name[:-len(SNAPSHOT_EXTENSION)]
+                summaries.append(self._summary(snapshot_id, read_snapshot_header(self.path(snapshot_id))))
+        return sorted(summaries, key=lambda summary: summary['created'], reverse=True)
+
+    def latest(self)->str:
+        """
+        Returns the id of the most recent snapshot, or None if the store is empty.
+        """
+        summaries = self.list()
+        return summaries[0]['id'] if summaries else None
+
+    def export_bif(self, snapshot_id:str, file_path:str)->str:
+        """
+        Exports a snapshot to a BIF file.
+
+        return: str - the path of the BIF file
+        """
+        bn, _ = self.load(snapshot_id)
+        gum.saveBN(bn, file_path)
+        return file_path
@@ -20,9 +20,8 @@ USER_PROFILE = """
 LEARNING_ALGORITHM_NAME = """greedy hill climbing"""
 # LEARNING_ALGORITHM_NAME = """MIIC"""
 
-GRAPH_CONTEXT = f"""
-The graph you're working with is a classic graph in causal inference that looks at the potential causes of tuburculosis or lung cancer given variables such as smoking or a visit to asia
-"""
+# the graph context is the description of the network being served -- set from the network registry (see networks.json)
+GRAPH_CONTEXT = """"""
 
 ###############################################################################
 INITIAL_PROMPT ={
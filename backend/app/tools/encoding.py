@@ -0,0 +1,54 @@
+from flask import Response, request
+import numpy as np
+
+import gzip
+import json
+
+# orjson and brotli are optional -- responses fall back to the standard json encoder and gzip
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# responses smaller than this are sent uncompressed
+MIN_COMPRESS_BYTES = 1024
+
+def _default(obj):
+    """
+    Helper serializing numpy values for the standard json encoder.
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(payload)->bytes:
+    """
+    Serializes a payload (which may hold numpy arrays and scalars) to compact json bytes.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS, default=_default)
+    return json.dumps(payload, separators=(',', ':'), default=_default).encode('utf-8')
+
+def encode_response(payload, status:int=200)->Response:
+    """
+    Returns a json response for a payload, compressed with brotli or gzip when the client accepts it and the body is large enough.
+    """
+    body = dumps(payload)
+    response = Response(body, status=status, mimetype='application/json')
+    accept_encoding = request.headers.get('Accept-Encoding', '').lower()
+    if len(body) >= MIN_COMPRESS_BYTES:
+        if brotli is not None and 'br' in accept_encoding:
+            response.set_data(brotli.compress(body))
+            response.headers['Content-Encoding'] = 'br'
+        elif 'gzip' in accept_encoding:
+            response.set_data(gzip.compress(body, compresslevel=5))
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept-Encoding'
+    return response
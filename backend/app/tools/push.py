@@ -0,0 +1,83 @@
+import threading
+
+# SocketIO namespace of the network push channel (kept apart from the chat's default namespace)
+PUSH_NAMESPACE = '/network'
+
+# edits to a network within this many seconds are coalesced into one graph patch
+DEFAULT_COALESCE_SECONDS = 0.25
+
+def network_room(network_id:str)->str:
+    """
+    Returns the SocketIO room of the clients subscribed to a network.
+    """
+    return f"network:{network_id}"
+
+class NetworkPushChannel:
+    """
+    Pushes network updates (graph patches, estimate results, independence test progress and learning job updates) to SocketIO clients.
+
+    Clients join a room per network on the PUSH_NAMESPACE namespace; results of a client's own requests can also be sent to its session (its socket id).
+    Graph patches are coalesced: edits made within coalesce_seconds of each other are sent as one patch holding the last change of each edge.
+
+    attributes:
+    - socketio (flask_socketio.SocketIO): the app's SocketIO server.
+    - coalesce_seconds (float): coalescing window of graph patches.
+
+    Methods:
+    - emit
+    - queue_graph_patch
+    - replace_graph
+    """
+    def __init__(self, socketio, coalesce_seconds:float=DEFAULT_COALESCE_SECONDS)->None:
+        """
+        Constructor for a new push channel.
+        """
+        self.socketio = socketio
+        self.coalesce_seconds = coalesce_seconds
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event:str, payload:dict, network_id:str, sid:str=None)->None:
+        """
+        Emits an event to a client session if sid is given, else to every client subscribed to the network.
+        """
+        self.socketio.emit(event, {"networkId": network_id, **payload}, to=sid or network_room(network_id), namespace=PUSH_NAMESPACE)
+
+    def queue_graph_patch(self, network_id:str, graph_version:int, changes:list[dict], positions:dict=None)->None:
+        """
+        Queues edge changes (in the format of update_network) and moved node positions to be pushed as a 'graph_patch' event once the coalescing window closes.
+        """
+        with self._lock:
+            pending = self._pending.get(network_id)
+            schedule = pending is None
+            if schedule:
+                pending = self._pending[network_id] = {"changes": {}, "positions": {}}
+            pending["graph_version"] = graph_version
+            pending["positions"].update(positions or {})
+            for change in changes:
+                edge = change.get('deletion', change.get('addition'))
+                key = (edge['data']['source'], edge['data']['target'])
+                # additions and deletions are idempotent, so the last change of an edge decides its state
+                pending["changes"].pop(key, None)
+                pending["changes"][key] = change
+        if schedule:
+            self.socketio.start_background_task(self._flush_later, network_id)
+
+    def _flush_later(self, network_id:str)->None:
+        """
+        Helper waiting for the coalescing window to close and pushing the pending patch of a network.
+        """
+        self.socketio.sleep(self.coalesce_seconds)
+        with self._lock:
+            pending = self._pending.pop(network_id, None)
+        if pending:
+            self.emit('graph_patch', {"graphVersion": pending["graph_version"], "changes": list(pending["changes"].values()),
+                                      "positions": pending["positions"]}, network_id)
+
+    def replace_graph(self, network_id:str, graph_version:int, elements:list[dict])->None:
+        """
+        Pushes a whole new graph (ex. after learning or restoring a snapshot), dropping any pending patch of the network.
+        """
+        with self._lock:
+            self._pending.pop(network_id, None)
+        self.emit('graph_patch', {"graphVersion": graph_version, "replace": elements}, network_id)
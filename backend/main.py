@@ -1,4 +1,3 @@
-from app.main.app import create_app, socketio
 # from config import APP_PORT, APP_HOST
 from dotenv import load_dotenv,dotenv_values, set_key
 
@@ -18,4 +17,7 @@ def main()-> None:
     print(f'Running app backend at host {host}, port {port}...')
     socketio.run(app,port=port, host=host, debug=True, allow_unsafe_werkzeug=True)
 
-main()
\ No newline at end of file
+# the effect matrix and sensitivity process pools spawn processes that import this module, so the app is only built when run as a script
+if __name__ == '__main__':
+    from app.main.app import create_app, socketio
+    main()
\ No newline at end of file
@@ -0,0 +1,61 @@
+import pyAgrum as gum
+import pyAgrum.lib.explain as expl
+import numpy as np
+
+import os
+import math
+import unittest
+
+from app.tools.causal_network.network_pyagrum import CausalNetwork
+
+DATASETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'toy_datasets')
+DATA_PATH = os.path.join(DATASETS, 'sample_asia.csv')
+STRUCTURE_PATH = os.path.join(DATASETS, 'asia.bif')
+
+class PyAgrumParityTest(unittest.TestCase):
+    """
+    Checks the code that replaces pyAgrum's own (chi2 tests and CPT fitting on cached count tables, and the private
+    pyAgrum.lib.explain._independenceListForPairs) against pyAgrum on the asia sample, so a pyAgrum upgrade cannot silently change the results.
+
+    Run from /backend with: python -m unittest discover tests
+    """
+    @classmethod
+    def setUpClass(cls)->None:
+        """
+        Loads the asia network once for every check.
+        """
+        cls.cn = CausalNetwork(DATA_PATH, STRUCTURE_PATH)
+
+    def test_independence_propositions(self)->None:
+        """
+        The private proposition helper lists the same tests as expl.independenceListForPairs.
+        """
+        expected = expl.independenceListForPairs(self.cn.causal_network, DATA_PATH, plot=False)
+        self.assertEqual(set(self.cn.get_independence_propositions()), set(expected))
+
+    def test_independence_p_values(self)->None:
+        """
+        The chi2 tests on count tables give pyAgrum's p-values.
+        """
+        expected = expl.independenceListForPairs(self.cn.causal_network, DATA_PATH, plot=False)
+        p_values = self.cn.get_independence_test_dict()
+        for proposition, p_value in expected.items():
+            # pyAgrum evaluates the chi2 survival function with its own series approximation, which agrees to about 1e-7 relative
+            self.assertTrue(math.isclose(p_values[proposition], p_value, rel_tol=1e-6, abs_tol=1e-12), f"{proposition}: {p_values[proposition]} != {p_value}")
+
+    def test_fit_parameters(self)->None:
+        """
+        Fitting every CPT from count tables gives the CPTs of BNLearner.learnParameters with the same smoothing prior.
+        """
+        bn = gum.BayesNet(self.cn.causal_network)
+        self.cn.fit_parameters(bn=bn)
+        learner = gum.BNLearner(DATA_PATH, self.cn.causal_network)
+        learner.useSmoothingPrior(1e-5)
+        expected = learner.learnParameters(self.cn.causal_network.dag())
+        for node in bn.names():
+            # compare with the axes in the same variable order
+            cpt = bn.cpt(node)
+            self.assertTrue(np.allclose(cpt.toarray(), expected.cpt(node).reorganize(list(cpt.names)).toarray(), rtol=0, atol=1e-12), node)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -14,6 +14,7 @@
  * Effects:
  * - An effect to fetch initial network data and node-value pairs from the backend
  * - An effect to re-fetch network data when user updates occur
+ * - An effect subscribing to the network push channel, applying the graph patches pushed by the backend
  * 
  * Functions:
  * - onUpdateNetwork: function | Invokes backend update calls for the network and refreshes local state
@@ -24,7 +25,8 @@
  * and facilitates communication and data flow between them.
  */
 
-import React, { useState, useEffect} from 'react';
+import React, { useState, useEffect, useRef} from 'react';
+import io from 'socket.io-client';
 import Row from 'react-bootstrap/Row';
 
 import ToolsContainer from './ToolsContainer';
@@ -37,6 +39,7 @@ const AppContainer = () => {
     const [nodeValuePairs, setNodeValuePairs] = useState([]);
     const [userUpdates, setUserUpdates] = useState([]);
     const [keyContents,setKeyContents] = useState([]);
+    const pushSocket = useRef(null);
     
 
     const [elementStyle, setElementStyle] = useState(
@@ -96,17 +99,64 @@ const AppContainer = () => {
     
         // Empty dependency array means this effect runs only once after initial render
     }, []);
+
+    //subscribing to the network push channel (graph patches of every client's edits, learning jobs and snapshot restores)
+    const baseURLSocket = `${import.meta.env.VITE_REACT_APP_BACKEND_URL_SOCKET}:${import.meta.env.VITE_REACT_APP_BACKEND_PORT}`||"ws://127.0.0.1:8000";
+    useEffect(() => {
+        const socketInstance = io(`${baseURLSocket}/network`);
+
+        socketInstance.on('connect', () => {
+            socketInstance.emit('subscribe', {});
+        });
+
+        socketInstance.on('graph_patch', (patch) => {
+            if (patch.replace) {
+                setElements(patch.replace);
+                return;
+            }
+            setElements((previous) => {
+                let updated = [...previous];
+                patch.changes.forEach((change) => {
+                    const edge = change.addition || change.deletion;
+                    const id = `${edge.data.source}->${edge.data.target}`;
+                    updated = updated.filter((element) => element.data.id !== id);
+                    if (change.addition) {
+                        updated.push({'data': {'source': edge.data.source, 'target': edge.data.target, 'label': id, 'id': id}});
+                    }
+                });
+                // nodes moved by the incremental relayout
+                const positions = patch.positions || {};
+                updated = updated.map((element) =>
+                    positions[element.data.id] ? {...element, 'position': positions[element.data.id]} : element);
+                return updated;
+            });
+        });
+
+        pushSocket.current = socketInstance;
+
+        // Cleanup on component unmount
+        return () => {
+            socketInstance.disconnect();
+        };
+    }, []);
     
     //updating network state
     const onUpdateNetwork = async () => {
         // send changes to backend
         handleApiCall(networkEndpoint, `PUT`,{'changes':userUpdates})
-        .then(() => {
+        .then((response) => {
             setUserUpdates([]);
+            // the push channel sends the resulting graph patch when connected, unless some local edits were rejected (ex. a cycle) and need undoing
+            const allApplied = response && response.applied && response.applied.length === userUpdates.length;
+            if (pushSocket.current && pushSocket.current.connected && allApplied) {
+                return null;
+            }
             return handleApiCall(networkEndpoint, `GET`)
         })
         .then((networkElements) => {
-            setElements(networkElements);
+            if (networkElements) {
+                setElements(networkElements);
+            }
         })
         .catch((error) => {
             console.error('Error in fetching network:', error);
@@ -118,7 +118,8 @@ const BayesianNetwork = ({ elements, setElements, userUpdates, setUserUpdates,el
     <CytoscapeComponent
       id="cytoscape-basic-example"
       elements={elements}
-      layout={{ name: 'dagre', padding: 10 }}
+      // nodes come with positions from the backend's cached layout; dagre is only a fallback for elements without them
+      layout={elements.some(element => element.position) ? { name: 'preset', padding: 10 } : { name: 'dagre', padding: 10 }}
       style={ { width: '100%',
       height: '600px'}
       // border:'solid'}